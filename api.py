@@ -0,0 +1,129 @@
+import json
+from datetime import datetime
+
+from flask import Blueprint, Response, abort, current_app, request, stream_with_context
+from sqlalchemy.orm import contains_eager, load_only
+
+from metrics import count_rows
+from models import Artist, Show, Venue
+from pagination import Page, seek
+
+#----------------------------------------------------------------------------#
+# JSON / NDJSON API.
+#----------------------------------------------------------------------------#
+# /api/v1/<resource>          one keyset page as JSON, with ?after=/?before=
+#                             cursors and ?limit=
+# /api/v1/<resource>.ndjson   every row from ?after= onwards, streamed one
+#                             JSON document per line from a server-side cursor
+#
+# Both accept ?fields=a,b to trim each record. Records use the same shapes as
+# the HTML pages: Venue.detail(), Artist.details() and Show.detail().
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+RESOURCE = '<any(venues, artists, shows):resource>'
+
+
+def venues_resource():
+    return Venue.query, (Venue.name, Venue.id), Venue.detail
+
+
+def artists_resource():
+    return Artist.query, (Artist.name, Artist.id), Artist.details
+
+
+def shows_resource():
+    query = Show.query.join(Show.venue).join(Show.artist).options(
+        load_only(Show.venue_id, Show.artist_id, Show.start_time),
+        contains_eager(Show.venue).load_only(Venue.id, Venue.name),
+        contains_eager(Show.artist).load_only(
+            Artist.id, Artist.name, Artist.image_link)
+    ).filter(Show.start_time.isnot(None))
+    return query, (Show.start_time, Show.id), Show.detail
+
+
+RESOURCES = {
+    'venues': venues_resource,
+    'artists': artists_resource,
+    'shows': shows_resource,
+}
+
+
+@api.route('/' + RESOURCE)
+def listing(resource):
+    query, columns, serialize = RESOURCES[resource]()
+    page = Page(
+        query,
+        columns,
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+        size=page_size()
+    )
+    fields = requested_fields()
+    body = dumps({
+        'data': [select(serialize(row), fields) for row in page.items],
+        'next': page.next_cursor,
+        'previous': page.prev_cursor
+    })
+    return Response(body, mimetype='application/json')
+
+
+@api.route('/' + RESOURCE + '.ndjson')
+def export(resource):
+    query, columns, serialize = RESOURCES[resource]()
+    query = seek(query, columns, request.args.get('after'))
+    fields = requested_fields()
+    # Unknown ?fields= are checked against one record before the response
+    # starts, so they get a 400 rather than a truncated 200 stream. The
+    # server-side cursor itself is opened inside the stream: the request's
+    # session is removed (and its transaction rolled back) once this view
+    # returns.
+    if fields is not None:
+        first = query.limit(1).first()
+        if first is not None:
+            select(serialize(first), fields)
+
+    def generate():
+        rows = query.execution_options(count_consumed_rows=True).yield_per(
+            current_app.config['STREAM_BATCH_SIZE'])
+        for row in rows:
+            count_rows(1)
+            yield dumps(select(serialize(row), fields)) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+def page_size():
+    try:
+        size = int(request.args.get('limit', current_app.config['PAGE_SIZE']))
+    except ValueError:
+        abort(400)
+    if size < 1:
+        abort(400)
+    return min(size, current_app.config['API_MAX_PAGE_SIZE'])
+
+
+def requested_fields():
+    fields = request.args.get('fields')
+    if not fields:
+        return None
+    return [field.strip() for field in fields.split(',') if field.strip()]
+
+
+def select(record, fields):
+    if fields is None:
+        return record
+    missing = [field for field in fields if field not in record]
+    if missing:
+        abort(400, 'Unknown fields: ' + ', '.join(missing))
+    return dict((field, record[field]) for field in fields)
+
+
+def dumps(value):
+    return json.dumps(value, default=encode)
+
+
+def encode(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError('%r is not JSON serializable' % (value,))
@@ -0,0 +1,95 @@
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import text
+
+from models import db
+
+#----------------------------------------------------------------------------#
+# Show archive.
+#----------------------------------------------------------------------------#
+# Shows that started more than SHOW_ARCHIVE_DAYS ago are moved from `show`
+# into show_archive, a plain table with no range column, exclusion
+# constraints or partitions. `show` then holds the upcoming and recently
+# played shows that almost every request reads, and its indexes stay small.
+# The past-shows sections of the venue and artist pages read both tables one
+# page at a time (Show.past_for_venue/past_for_artist); /shows and the API
+# list the hot table only. Run it from cron, e.g.
+#
+#   30 3 * * * cd /srv/fyyur && flask archive run
+#
+# Once a month has been archived its partition is empty and can be dropped
+# with `flask partitions detach --drop`.
+
+archive_cli = AppGroup('archive', help='Move old shows into show_archive.')
+
+# Oldest first, so a batch reads the first partitions and stops. The
+# counter triggers skip the DELETE while fyyur.archiving is on: the shows
+# stay counted as past.
+MOVE = '''
+WITH moved AS (
+    DELETE FROM show WHERE (id, start_time) IN (
+        SELECT id, start_time FROM show
+        WHERE start_time < :cutoff
+        ORDER BY start_time
+        LIMIT :batch_size
+    )
+    RETURNING id, artist_id, venue_id, start_time, duration_minutes
+)
+INSERT INTO show_archive (id, artist_id, venue_id, start_time, duration_minutes)
+SELECT id, artist_id, venue_id, start_time, duration_minutes FROM moved
+ON CONFLICT (id) DO UPDATE SET
+    artist_id = EXCLUDED.artist_id,
+    venue_id = EXCLUDED.venue_id,
+    start_time = EXCLUDED.start_time,
+    duration_minutes = EXCLUDED.duration_minutes
+'''
+
+
+def cutoff(days=None):
+    if days is None:
+        days = current_app.config['SHOW_ARCHIVE_DAYS']
+    return datetime.now() - timedelta(days=days)
+
+
+def archive(before, batch_size):
+    # One transaction per batch keeps locks and WAL bursts short.
+    moved = 0
+    while True:
+        db.session.execute(text("SET LOCAL fyyur.archiving = 'on'"))
+        count = db.session.execute(
+            text(MOVE), {'cutoff': before, 'batch_size': batch_size}).rowcount
+        db.session.commit()
+        moved += count
+        if count < batch_size:
+            return moved
+
+
+@archive_cli.command('run')
+@click.option('--days', type=click.IntRange(min=1),
+              help='Archive shows older than this many days '
+                   '(default: SHOW_ARCHIVE_DAYS).')
+@click.option('--batch-size', default=5000, show_default=True)
+def run_command(days, batch_size):
+    """Move shows older than the archive horizon into show_archive."""
+    before = cutoff(days)
+    started = time.monotonic()
+    moved = archive(before, batch_size)
+    click.echo('archived %d shows before %s in %.2fs' % (
+        moved, before.strftime('%Y-%m-%d %H:%M'), time.monotonic() - started), err=True)
+
+
+@archive_cli.command('status')
+def status_command():
+    """Show how many shows are hot and archived."""
+    row = db.session.execute(text(
+        'SELECT (SELECT count(*) FROM show) AS hot, '
+        '(SELECT count(*) FROM show WHERE start_time < :cutoff) AS due, '
+        '(SELECT count(*) FROM show_archive) AS archived, '
+        '(SELECT max(start_time) FROM show_archive) AS newest'
+    ), {'cutoff': cutoff()}).one()
+    click.echo('show: %d rows (%d due for archiving)' % (row.hot, row.due))
+    click.echo('show_archive: %d rows, newest %s' % (row.archived, row.newest or '-'))
@@ -0,0 +1,195 @@
+from datetime import datetime
+
+from flask import Blueprint, abort, current_app, flash, make_response, redirect, render_template, request, session, stream_template, url_for
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import load_only
+
+import conditional
+import facets
+import search
+from cache import artist_key, cache, cache_timeout, facet_key, invalidate_artist
+from forms import ArtistForm, genre_choices
+from models import db, Artist, Show
+from pagination import Page
+from routing import primary_reads
+
+blueprint = Blueprint('artist', __name__)
+
+#  Artists
+#  ----------------------------------------------------------------
+
+@blueprint.route('/artists')
+def artists():
+    form = ArtistForm()
+    choices = genre_choices(ArtistForm)
+    genres = facets.requested(request.args, choices)
+    tag, modified = conditional.listing(
+        db.session.execute(conditional.listing_statement(Artist)).one())
+    if conditional.is_fresh(request, session, tag, modified):
+        return conditional.validate(current_app.response_class(status=304), tag, modified)
+    query = Artist.query.options(load_only(Artist.id, Artist.name))
+    if genres:
+        query = query.filter(facets.contains(Artist, genres))
+    page = Page(
+        query,
+        (Artist.name, Artist.id),
+        after=request.args.get('after'),
+        before=request.args.get('before')
+    )
+    return conditional.validate(current_app.response_class(stream_template(
+        'pages/artists.html', artists=page, page=page, form=form,
+        facets=facets.counts(Artist, choices), genres=genres)), tag, modified)
+
+
+@blueprint.route('/artists/search', methods=['POST'])
+def search_artists():
+    artists_query = search.artists(request.form['search_term'])
+    artrist_list = list(map(Artist.short, artists_query))
+    response = {
+        "count": len(artrist_list),
+        "data": artrist_list
+    }
+    return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
+
+
+@blueprint.route('/artists/<int:artist_id>')
+def show_artist(artist_id):
+    # shows the artist page with the given artist_id
+    current_time = datetime.now()
+    validators = db.session.execute(conditional.detail_statement(Artist, artist_id)).first()
+    if validators is None:
+        abort(404)
+    tag, modified = conditional.detail(validators, current_time)
+    if conditional.is_fresh(request, session, tag, modified):
+        return conditional.validate(current_app.response_class(status=304), tag, modified)
+    artists_details = cache.get(artist_key(artist_id))
+    if artists_details is None:
+        with primary_reads():
+            artists_query = Artist.query.get_or_404(artist_id)
+            artists_details = Artist.details(artists_query)
+            # Upcoming shows come from the hot partitions only; past shows are
+            # one page at a time, from `show` and show_archive.
+            new_shows_query = db.session.scalars(Show.for_artist(artist_id).filter(
+                Show.start_time > current_time).order_by(Show.start_time)).all()
+            new_shows_list = list(map(Show.venues_details, new_shows_query))
+            artists_details["upcoming_shows"] = new_shows_list
+            artists_details["upcoming_shows_count"] = len(new_shows_list)
+            artists_details["past_shows_count"] = artists_query.past_shows_count
+            artists_details.update(past_shows(artist_id, current_time))
+        cache.set(artist_key(artist_id), artists_details,
+                  timeout=cache_timeout(new_shows_list, current_time))
+    # Only the first page of past shows is cached.
+    after, before = request.args.get('after'), request.args.get('before')
+    if after or before:
+        artists_details = dict(artists_details, **past_shows(
+            artist_id, current_time, after, before))
+    return conditional.validate(make_response(render_template(
+        'pages/show_artist.html', artist=artists_details)), tag, modified)
+
+
+def past_shows(artist_id, current_time, after=None, before=None):
+    query, columns = Show.past_for_artist(artist_id, current_time)
+    page = Page(query, columns, after=after, before=before,
+                size=current_app.config['PAST_SHOWS_PAGE_SIZE'], descending=True)
+    return {
+        "past_shows": [row._asdict() for row in page.items],
+        "past_page": {"prev_cursor": page.prev_cursor, "next_cursor": page.next_cursor},
+    }
+
+#  Update
+#  ----------------------------------------------------------------
+
+
+@blueprint.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+    # TODO: populate form with fields from artist with ID <artist_id>
+    artists_data = Artist.query.filter_by(id=artist_id).first_or_404()
+    form = ArtistForm(obj=artists_data)
+    return render_template('forms/edit_artist.html', form=form, artist=artists_data)
+
+
+@blueprint.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+    # TODO: take values from the form submitted, and update existing
+    # artist record with ID <artist_id> using the new attributes
+
+    form = ArtistForm(request.form)
+    artist = Artist.query.filter_by(id=artist_id).first_or_404()
+    if artist:
+        if form.validate_on_submit():
+            try:
+                artist.name = form.name.data
+                artist.city = form.city.data
+                artist.state = form.state.data
+                artist.phone = form.phone.data
+                artist.genres = form.genres.data
+                artist.image_link = form.image_link.data
+                artist.facebook_link = form.facebook_link.data
+                artist.website_link = form.website_link.data
+                artist.looking_for_venues = form.seeking_venue.data
+                artist.description = form.seeking_description.data
+                Artist.update(artist)
+                invalidate_artist(artist_id)
+                flash('Venue ' + artist.name + ' was successfully updated!')
+                return redirect(url_for('.show_artist', artist_id=artist_id))
+            except:
+                db.session.rollback()
+                db.session.close()
+                flash(
+                    'An error occurred. Artist ' +
+                    request.form.get("name") +
+                    ' could not be updated.'
+                )
+        else:
+            print(form.errors)
+            return redirect(url_for('.show_artist', artist_id=artist_id))
+
+#  Create Artist
+#  ----------------------------------------------------------------
+
+
+@blueprint.route('/artists/create', methods=['GET'])
+def create_artist_form():
+    form = ArtistForm()
+    return render_template('forms/new_artist.html', form=form)
+
+
+@blueprint.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+    # called upon submitting the new artist listing form
+    # TODO: insert form data as a new Venue record in the db, instead
+    # TODO: modify data to be the data object returned from db insertion
+    form = ArtistForm(request.form)
+    if form.validate_on_submit():
+        try:
+            data = Artist(
+                name=form.name.data,
+                city=form.city.data,
+                state=form.state.data,
+                phone=form.phone.data,
+                image_link=form.image_link.data,
+                facebook_link=form.facebook_link.data,
+                genres=form.genres.data,
+                website=form.website_link.data,
+                seeking_venue=form.seeking_venue.data,
+                seeking_description=form.seeking_description.data
+            )
+            data.insert()
+            cache.delete(facet_key(Artist))
+            # on successful db insert, flash success
+            flash('Artist ' + request.form['name'] +
+                  ' was successfully listed!')
+            db.session.close()
+            return render_template('pages/home.html')
+        except SQLAlchemyError:
+            db.session.rollback()
+            db.session.close()
+            # TODO: on unsuccessful db insert, flash an error instead.
+            # e.g., flash('An error occurred. Venue ' + data.name + ' could not be listed.')
+            # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
+            flash('An error occurred. Artist ' +
+                  data.name + ' could not be listed.')
+            return render_template('forms/new_artist.html', form=form)
+    else:
+        flash(form.errors)
+        return render_template('forms/new_artist.html', form=form)
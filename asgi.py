@@ -0,0 +1,393 @@
+import asyncio
+import itertools
+import time
+from datetime import datetime
+
+from asgiref.wsgi import WsgiToAsgi
+from quart import Blueprint, Quart, abort, g, render_template, request
+from quart import session as cookie_session
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import contains_eager, load_only
+from werkzeug.exceptions import MethodNotAllowed, NotFound
+from werkzeug.http import http_date
+
+import conditional
+import directory
+import facets
+import metrics
+import search
+import template_cache
+from app import create_app
+from cache import RedisCache, artist_key, cache, cache_timeout, facet_key, venue_key
+from formatting import format_datetime, format_datetimes
+from forms import ArtistForm, VenueForm, genre_choices
+from models import Artist, Show, Venue, async_engine_options, async_url, statement_timeout
+from pagination import AsyncPage
+from routing import PIN_COOKIE, SAFE_METHODS
+
+#----------------------------------------------------------------------------#
+# Async serving mode.
+#----------------------------------------------------------------------------#
+#   hypercorn asgi:app --bind 0.0.0.0:8000
+#
+# The read routes (home, directories, venue/artist pages and search) run as
+# coroutines on an asyncpg engine, so a request waiting on Postgres does not
+# hold a thread and one process can keep many page loads in flight. Every
+# other path falls through to the regular Flask app, in the same process, so
+# both modes share the page cache and its invalidation. `flask run` and any
+# WSGI server still serve the fully synchronous app.
+
+wsgi_app = create_app()
+
+read_app = Quart(__name__)
+read_app.config.from_object('config')
+read_app.jinja_env.filters['datetime'] = format_datetime
+read_app.jinja_env.filters['datetimes'] = format_datetimes
+read_app.jinja_env.bytecode_cache = template_cache.bytecode_cache(wsgi_app.config, is_async=True)
+
+# Named like the Flask blueprints, so url_for() in the shared templates
+# resolves in both apps.
+venue_blueprint = Blueprint('venue', __name__)
+artist_blueprint = Blueprint('artist', __name__)
+show_blueprint = Blueprint('show', __name__)
+
+
+def create_engine(url, logging_name):
+    url = async_url(url)
+    engine = create_async_engine(url, **async_engine_options(read_app.config, url, logging_name))
+    if read_app.config['DB_PGBOUNCER'] and read_app.config['DB_STATEMENT_TIMEOUT_MS']:
+        event.listen(engine.sync_engine, 'begin', statement_timeout(
+            read_app.config['DB_STATEMENT_TIMEOUT_MS']))
+    return engine
+
+
+primary = async_sessionmaker(
+    create_engine(read_app.config['SQLALCHEMY_DATABASE_URI'], 'async_primary'),
+    expire_on_commit=False)
+replicas = [
+    async_sessionmaker(create_engine(url, 'async_replica_%d' % index), expire_on_commit=False)
+    for index, url in enumerate(read_app.config['DATABASE_REPLICA_URLS'])
+]
+_next_replica = itertools.count()
+
+
+def session():
+    # Same rule as routing.py: GET requests read from a replica unless the
+    # client has just written.
+    if replicas and request.method in SAFE_METHODS and PIN_COOKIE not in request.cookies:
+        return replicas[next(_next_replica) % len(replicas)]()
+    return primary()
+
+
+async def cache_call(method, *args, **kwargs):
+    # The in-process LRU is a dict lookup; a Redis round trip must not block
+    # the event loop.
+    if isinstance(cache.backend, RedisCache):
+        return await asyncio.to_thread(method, *args, **kwargs)
+    return method(*args, **kwargs)
+
+
+async def facet_counts(model, choices):
+    # Cache fills read from the primary, as with routing.primary_reads.
+    key = facet_key(model)
+    result = await cache_call(cache.get, key)
+    if result is None:
+        async with primary() as db_session:
+            result = facets.from_rows(
+                choices, await db_session.execute(facets.statement(model, choices)))
+        await cache_call(cache.set, key, result)
+    return result
+
+
+def unchanged(tag, modified):
+    # The 304 for a revisit whose validators still match, or None.
+    if conditional.is_fresh(request, cookie_session, tag, modified):
+        return conditional.validate(read_app.response_class('', status=304), tag, modified)
+    return None
+
+
+async def past_shows(db_session, past, args=None):
+    # One page of a past-shows section; without `args`, the first page,
+    # which is the one that is cached.
+    args = args or {}
+    statement, columns = past
+    page = await AsyncPage(
+        statement, columns, after=args.get('after'), before=args.get('before'),
+        size=read_app.config['PAST_SHOWS_PAGE_SIZE'], descending=True
+    ).load(db_session)
+    return {
+        "past_shows": [row._asdict() for row in page.items],
+        "past_page": {"prev_cursor": page.prev_cursor, "next_cursor": page.next_cursor},
+    }
+
+
+@read_app.before_serving
+async def start_refresher():
+    # The directory routes here never pass through the Flask app's
+    # before_request hook that normally starts the refresh thread.
+    if wsgi_app.config['DIRECTORY_REFRESH_INTERVAL']:
+        directory.refresher.start()
+
+
+@read_app.before_request
+async def start_request():
+    g.request_started = time.perf_counter()
+    g.sql = metrics.start_sql()
+
+
+@read_app.after_request
+async def record_request(response):
+    if 'request_started' not in g:
+        return response
+    endpoint = request.endpoint or 'unmatched'
+    metrics.request_seconds.observe(
+        time.perf_counter() - g.request_started, endpoint=endpoint,
+        method=request.method, status=response.status_code)
+    metrics.record_sql(g.sql, endpoint)
+    return response
+
+
+@read_app.errorhandler(404)
+async def not_found_error(error):
+    return await render_template('errors/404.html'), 404
+
+
+@read_app.errorhandler(500)
+async def server_error(error):
+    return await render_template('errors/500.html'), 500
+
+#----------------------------------------------------------------------------#
+# Controllers.
+#----------------------------------------------------------------------------#
+
+
+@read_app.route('/')
+async def index():
+    return await render_template('pages/home.html')
+
+
+@venue_blueprint.route('/venues')
+async def venues():
+    choices = genre_choices(VenueForm)
+    genres = facets.requested(request.args, choices)
+    if genres:
+        statement = Venue.directory_statement().filter(facets.contains(Venue, genres))
+        columns = (Venue.state, Venue.city, Venue.name, Venue.id)
+    else:
+        statement = directory.statement()
+        c = directory.venue_directory.c
+        columns = (c.state, c.city, c.name, c.id)
+    page = AsyncPage(
+        statement,
+        columns,
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+        size=read_app.config['PAGE_SIZE']
+    )
+    refreshed = None
+    async with session() as db_session:
+        if not genres:
+            refreshed = (await db_session.execute(directory.refreshed_at_statement())).scalar()
+        tag, modified = conditional.listing(
+            (await db_session.execute(conditional.listing_statement(Venue))).one(), refreshed)
+        response = unchanged(tag, modified)
+        if response is not None:
+            return response
+        await page.load(db_session)
+        counts = await facet_counts(Venue, choices)
+    response = await read_app.make_response(await render_template(
+        'pages/venues.html', areas=Venue.areas(page), page=page, facets=counts, genres=genres))
+    if refreshed is not None:
+        response.headers['X-Directory-Refreshed-At'] = http_date(refreshed)
+        response.headers['X-Directory-Staleness'] = '%d' % directory.staleness(refreshed)
+    return conditional.validate(response, tag, modified)
+
+
+@venue_blueprint.route('/venues/search', methods=['POST'])
+async def search_venues():
+    term = (await request.form).get('search_term', '')
+    async with session() as db_session:
+        rows = (await db_session.execute(search.venues_statement(
+            term, read_app.config['SEARCH_RESULT_LIMIT']))).all()
+    venue_list = list(map(Venue.short, rows))
+    response = {
+        "count": len(venue_list),
+        "data": venue_list
+    }
+    return await render_template('pages/search_venues.html', results=response, search_term=term)
+
+
+@venue_blueprint.route('/venues/<int:venue_id>')
+async def show_venue(venue_id):
+    current_time = datetime.now()
+    async with session() as db_session:
+        validators = (await db_session.execute(
+            conditional.detail_statement(Venue, venue_id))).first()
+    if validators is None:
+        abort(404)
+    tag, modified = conditional.detail(validators, current_time)
+    response = unchanged(tag, modified)
+    if response is not None:
+        return response
+    venues_details = await cache_call(cache.get, venue_key(venue_id))
+    if venues_details is None:
+        async with primary() as db_session:
+            venue = await db_session.get(Venue, venue_id)
+            if venue is None:
+                abort(404)
+            venues_details = Venue.detail(venue)
+            upcoming = (await db_session.scalars(Show.for_venue(venue_id).filter(
+                Show.start_time > current_time).order_by(Show.start_time))).all()
+            venues_details["past_shows_count"] = venue.past_shows_count
+            venues_details.update(await past_shows(
+                db_session, Show.past_for_venue(venue_id, current_time, select)))
+        new_show = list(map(Show.artists_details, upcoming))
+        venues_details["upcoming_shows"] = new_show
+        venues_details["upcoming_shows_count"] = len(new_show)
+        await cache_call(cache.set, venue_key(venue_id), venues_details,
+                         timeout=cache_timeout(new_show, current_time))
+    if request.args.get('after') or request.args.get('before'):
+        async with session() as db_session:
+            venues_details = dict(venues_details, **await past_shows(
+                db_session, Show.past_for_venue(venue_id, current_time, select),
+                request.args))
+    return conditional.validate(await read_app.make_response(await render_template(
+        'pages/show_venue.html', venue=venues_details)), tag, modified)
+
+
+@artist_blueprint.route('/artists')
+async def artists():
+    choices = genre_choices(ArtistForm)
+    genres = facets.requested(request.args, choices)
+    statement = select(Artist.id, Artist.name)
+    if genres:
+        statement = statement.filter(facets.contains(Artist, genres))
+    page = AsyncPage(
+        statement,
+        (Artist.name, Artist.id),
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+        size=read_app.config['PAGE_SIZE']
+    )
+    async with session() as db_session:
+        tag, modified = conditional.listing(
+            (await db_session.execute(conditional.listing_statement(Artist))).one())
+        response = unchanged(tag, modified)
+        if response is not None:
+            return response
+        await page.load(db_session)
+        counts = await facet_counts(Artist, choices)
+    return conditional.validate(await read_app.make_response(await render_template(
+        'pages/artists.html', artists=page, page=page, facets=counts, genres=genres)),
+        tag, modified)
+
+
+@artist_blueprint.route('/artists/search', methods=['POST'])
+async def search_artists():
+    term = (await request.form).get('search_term', '')
+    async with session() as db_session:
+        rows = (await db_session.execute(search.artists_statement(
+            term, read_app.config['SEARCH_RESULT_LIMIT']))).all()
+    artist_list = list(map(Artist.short, rows))
+    response = {
+        "count": len(artist_list),
+        "data": artist_list
+    }
+    return await render_template('pages/search_artists.html', results=response, search_term=term)
+
+
+@artist_blueprint.route('/artists/<int:artist_id>')
+async def show_artist(artist_id):
+    current_time = datetime.now()
+    async with session() as db_session:
+        validators = (await db_session.execute(
+            conditional.detail_statement(Artist, artist_id))).first()
+    if validators is None:
+        abort(404)
+    tag, modified = conditional.detail(validators, current_time)
+    response = unchanged(tag, modified)
+    if response is not None:
+        return response
+    artists_details = await cache_call(cache.get, artist_key(artist_id))
+    if artists_details is None:
+        async with primary() as db_session:
+            artist = await db_session.get(Artist, artist_id)
+            if artist is None:
+                abort(404)
+            artists_details = Artist.details(artist)
+            upcoming = (await db_session.scalars(Show.for_artist(artist_id).filter(
+                Show.start_time > current_time).order_by(Show.start_time))).all()
+            artists_details["past_shows_count"] = artist.past_shows_count
+            artists_details.update(await past_shows(
+                db_session, Show.past_for_artist(artist_id, current_time, select)))
+        new_shows_list = list(map(Show.venues_details, upcoming))
+        artists_details["upcoming_shows"] = new_shows_list
+        artists_details["upcoming_shows_count"] = len(new_shows_list)
+        await cache_call(cache.set, artist_key(artist_id), artists_details,
+                         timeout=cache_timeout(new_shows_list, current_time))
+    if request.args.get('after') or request.args.get('before'):
+        async with session() as db_session:
+            artists_details = dict(artists_details, **await past_shows(
+                db_session, Show.past_for_artist(artist_id, current_time, select),
+                request.args))
+    return conditional.validate(await read_app.make_response(await render_template(
+        'pages/show_artist.html', artist=artists_details)), tag, modified)
+
+
+@show_blueprint.route('/shows')
+async def shows():
+    page = AsyncPage(
+        select(Show).join(Show.venue).join(Show.artist).options(
+            load_only(Show.id, Show.venue_id, Show.artist_id, Show.start_time),
+            contains_eager(Show.venue).load_only(Venue.id, Venue.name),
+            contains_eager(Show.artist).load_only(
+                Artist.id, Artist.name, Artist.image_link)
+        ).filter(Show.start_time.isnot(None)),
+        (Show.start_time, Show.id),
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+        size=read_app.config['PAGE_SIZE']
+    )
+    async with session() as db_session:
+        tag, modified = conditional.shows(
+            (await db_session.execute(conditional.shows_statement())).one())
+        response = unchanged(tag, modified)
+        if response is not None:
+            return response
+        await page.load(db_session)
+    return conditional.validate(await read_app.make_response(await render_template(
+        'pages/shows.html', shows=map(Show.detail, page), page=page)), tag, modified)
+
+#----------------------------------------------------------------------------#
+# Dispatch.
+#----------------------------------------------------------------------------#
+
+
+class Dispatcher(object):
+    # Sends requests that match a route of `read_app` to it and everything
+    # else to the WSGI app, which runs in a thread pool.
+
+    def __init__(self, read_app, wsgi_app):
+        self.read_app = read_app
+        self.wsgi_app = WsgiToAsgi(wsgi_app)
+        self.routes = read_app.url_map.bind('')
+
+    def handles(self, scope):
+        try:
+            self.routes.match(scope['path'], method=scope['method'])
+        except (NotFound, MethodNotAllowed):
+            return False
+        return True
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or self.handles(scope):
+            await self.read_app(scope, receive, send)
+        else:
+            await self.wsgi_app(scope, receive, send)
+
+
+read_app.register_blueprint(venue_blueprint)
+read_app.register_blueprint(artist_blueprint)
+read_app.register_blueprint(show_blueprint)
+app = Dispatcher(read_app, wsgi_app)
@@ -0,0 +1,13 @@
+# Benchmarks for Fyyur.
+#
+#   python -m benchmarks.seed --venues 2000 --artists 10000 --shows 200000
+#   python -m benchmarks.run --output results/$(git rev-parse --short HEAD).json
+#   python -m benchmarks.serving --sync-url http://localhost:5000 --async-url http://localhost:8000
+#   python -m benchmarks.startup --runs 10
+#
+# `seed` fills the configured database with a reproducible synthetic catalog;
+# `run` drives every read route through the Flask test client and, with
+# --url, through a concurrent HTTP load generator against a running server.
+# Both reports go to one JSON file so runs can be compared across commits.
+# `serving` loads a sync and an async server side by side (see asgi.py), and
+# `startup` times a fresh worker's imports, create_app() and first request.
@@ -0,0 +1,38 @@
+import json
+import os
+import subprocess
+import time
+
+#----------------------------------------------------------------------------#
+# JSON reports.
+#----------------------------------------------------------------------------#
+# Every benchmark writes one JSON report: the commit and time it ran at, its
+# command-line settings, and its own sections. Reports from different commits
+# can then be compared side by side.
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_report(args, sections):
+    # Writes to args.output, or stdout for '-'.
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'settings': vars(args),
+    }
+    report.update(sections)
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output == '-':
+        print(text)
+    else:
+        directory = os.path.dirname(args.output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.output, 'w') as output:
+            output.write(text + '\n')
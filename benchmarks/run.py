@@ -0,0 +1,201 @@
+import argparse
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from benchmarks.report import write_report
+
+#----------------------------------------------------------------------------#
+# Route benchmark.
+#----------------------------------------------------------------------------#
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark every Fyyur read route.')
+    parser.add_argument('--iterations', type=int, default=50,
+                        help='Test-client requests per route.')
+    parser.add_argument('--url', help='Also load-test a running server at this base URL.')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30.0,
+                        help='Seconds of HTTP load per route.')
+    parser.add_argument('--output', default='-', help="JSON report path ('-' for stdout).")
+    return parser.parse_args(argv)
+
+
+def routes(venue_id, artist_id):
+    # (name, method, path, form data). Write routes are left out so runs do
+    # not change the data they measure.
+    return [
+        ('index', 'GET', '/', None),
+        ('venues', 'GET', '/venues', None),
+        ('artists', 'GET', '/artists', None),
+        ('shows', 'GET', '/shows', None),
+        ('show_venue', 'GET', '/venues/%d' % venue_id, None),
+        ('show_artist', 'GET', '/artists/%d' % artist_id, None),
+        ('search_venues', 'POST', '/venues/search', {'search_term': 'hall'}),
+        ('search_artists', 'POST', '/artists/search', {'search_term': 'band'}),
+        ('edit_venue', 'GET', '/venues/%d/edit' % venue_id, None),
+        ('edit_artist', 'GET', '/artists/%d/edit' % artist_id, None),
+        ('create_venue_form', 'GET', '/venues/create', None),
+        ('create_artist_form', 'GET', '/artists/create', None),
+        ('create_shows', 'GET', '/shows/create', None),
+        ('api_venues', 'GET', '/api/v1/venues', None),
+        ('api_artists', 'GET', '/api/v1/artists', None),
+        ('api_shows', 'GET', '/api/v1/shows', None),
+    ]
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies, queries=None, elapsed=None, errors=0):
+    summary = {
+        'requests': len(latencies),
+        'errors': errors,
+        'p50_ms': _ms(percentile(latencies, 0.50)),
+        'p95_ms': _ms(percentile(latencies, 0.95)),
+        'p99_ms': _ms(percentile(latencies, 0.99)),
+        'mean_ms': _ms(sum(latencies) / len(latencies)) if latencies else None,
+    }
+    if queries:
+        summary['queries_per_request'] = float(sum(queries)) / len(queries)
+    if elapsed:
+        summary['throughput_rps'] = len(latencies) / elapsed
+    return summary
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+class QueryCounter(object):
+    # Counts every statement the in-process app executes; the test client
+    # runs one request at a time, so the count belongs to that request.
+
+    def __init__(self):
+        self.count = 0
+        event.listen(Engine, 'after_cursor_execute', self)
+
+    def __call__(self, *args):
+        self.count += 1
+
+    def close(self):
+        event.remove(Engine, 'after_cursor_execute', self)
+
+
+def test_client_phase(app, route_list, iterations):
+    client = app.test_client()
+    counter = QueryCounter()
+    results = {}
+    try:
+        for name, method, path, data in route_list:
+            latencies, queries, errors = [], [], 0
+            for _ in range(iterations):
+                counter.count = 0
+                started = time.perf_counter()
+                response = client.open(path, method=method, data=data)
+                # Streamed pages are only done once the body is consumed.
+                response.get_data()
+                latencies.append(time.perf_counter() - started)
+                queries.append(counter.count)
+                if response.status_code >= 400:
+                    errors += 1
+                response.close()
+            results[name] = summarize(latencies, queries, errors=errors)
+    finally:
+        counter.close()
+    return results
+
+
+SERVER_TIMING_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+def http_request(base_url, method, path, data):
+    body = urlencode(data).encode('ascii') if data else None
+    request = Request(base_url.rstrip('/') + path, data=body, method=method)
+    started = time.perf_counter()
+    try:
+        with urlopen(request, timeout=60) as response:
+            response.read()
+            status = response.status
+            timing = response.headers.get('Server-Timing', '')
+    except HTTPError as error:
+        error.read()
+        status, timing = error.code, ''
+    match = SERVER_TIMING_QUERIES.search(timing)
+    return time.perf_counter() - started, status, int(match.group(1)) if match else None
+
+
+def http_phase(base_url, route_list, concurrency, duration):
+    results = {}
+    for name, method, path, data in route_list:
+        latencies, queries = [], []
+        errors = [0]
+        lock = threading.Lock()
+        deadline = time.perf_counter() + duration
+
+        def worker():
+            while time.perf_counter() < deadline:
+                try:
+                    latency, status, query_count = http_request(base_url, method, path, data)
+                except OSError:
+                    with lock:
+                        errors[0] += 1
+                    continue
+                with lock:
+                    latencies.append(latency)
+                    if query_count is not None:
+                        queries.append(query_count)
+                    if status >= 400:
+                        errors[0] += 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for _ in range(concurrency):
+                pool.submit(worker)
+        results[name] = summarize(latencies, queries, time.perf_counter() - started, errors[0])
+    return results
+
+
+def sample_ids(db):
+    from models import Artist, Venue
+    venue_id = db.session.query(Venue.id).order_by(Venue.id).limit(1).scalar()
+    artist_id = db.session.query(Artist.id).order_by(Artist.id).limit(1).scalar()
+    if venue_id is None or artist_id is None:
+        raise SystemExit('No data to benchmark; run python -m benchmarks.seed first.')
+    return venue_id, artist_id
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    from app import create_app
+    from models import db
+    app = create_app()
+
+    with app.app_context():
+        venue_id, artist_id = sample_ids(db)
+    route_list = routes(venue_id, artist_id)
+
+    sections = {
+        'test_client': test_client_phase(app, route_list, args.iterations),
+    }
+    if args.url:
+        sections['http'] = http_phase(args.url, route_list, args.concurrency, args.duration)
+
+    write_report(args, sections)
+
+
+if __name__ == '__main__':
+    main()
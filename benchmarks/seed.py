@@ -0,0 +1,167 @@
+import argparse
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, text
+
+from forms import VenueForm, genre_choices
+
+#----------------------------------------------------------------------------#
+# Synthetic catalog.
+#----------------------------------------------------------------------------#
+# The same --seed always produces the same rows, so two commits benchmarked
+# against freshly seeded databases see identical data.
+
+CITIES = ['Springfield', 'Riverside', 'Franklin', 'Greenville', 'Bristol',
+          'Clinton', 'Fairview', 'Salem', 'Madison', 'Georgetown']
+WORDS = ['Blue', 'Velvet', 'Electric', 'Golden', 'Midnight', 'Silver', 'Wild',
+         'Lucky', 'Crimson', 'Echo', 'Neon', 'Hollow', 'Iron', 'Lonely', 'Royal']
+VENUE_KINDS = ['Hall', 'Lounge', 'Club', 'Theatre', 'Room', 'Arena', 'Bar']
+ARTIST_KINDS = ['Band', 'Trio', 'Collective', 'Orchestra', 'Quartet', 'Project']
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Seed a synthetic Fyyur catalog.')
+    parser.add_argument('--venues', type=int, default=1000)
+    parser.add_argument('--artists', type=int, default=5000)
+    parser.add_argument('--shows', type=int, default=100000)
+    parser.add_argument('--states', type=int, default=20,
+                        help='Number of states the venues are spread across.')
+    parser.add_argument('--past-days', type=int, default=730)
+    parser.add_argument('--future-days', type=int, default=365)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    parser.add_argument('--keep', action='store_true',
+                        help='Append instead of truncating the tables first.')
+    return parser.parse_args(argv)
+
+
+def name(rng, kinds):
+    return '%s %s %s' % (rng.choice(WORDS), rng.choice(WORDS), rng.choice(kinds))
+
+
+def venues(rng, count, states, genres):
+    for index in range(count):
+        yield {
+            'name': name(rng, VENUE_KINDS),
+            'city': rng.choice(CITIES),
+            'state': rng.choice(states),
+            'address': '%d Main Street' % rng.randint(1, 9999),
+            'phone': '555-%03d-%04d' % (rng.randint(0, 999), rng.randint(0, 9999)),
+            'image_link': 'https://example.com/venues/%d.jpg' % index,
+            'facebook_link': 'https://facebook.com/venue%d' % index,
+            'website': 'https://venue%d.example.com' % index,
+            'seeking_talent': rng.random() < 0.3,
+            'description': 'Looking for local acts.',
+            'genres': rng.sample(genres, rng.randint(1, 3)),
+        }
+
+
+def artists(rng, count, states, genres):
+    for index in range(count):
+        yield {
+            'name': name(rng, ARTIST_KINDS),
+            'city': rng.choice(CITIES),
+            'state': rng.choice(states),
+            'phone': '555-%03d-%04d' % (rng.randint(0, 999), rng.randint(0, 9999)),
+            'image_link': 'https://example.com/artists/%d.jpg' % index,
+            'facebook_link': 'https://facebook.com/artist%d' % index,
+            'website': 'https://artist%d.example.com' % index,
+            'seeking_venue': rng.random() < 0.5,
+            'seeking_description': 'Touring this year.',
+            'genres': rng.sample(genres, rng.randint(1, 3)),
+        }
+
+
+def shows(rng, count, venue_ids, artist_ids, now, past_days, future_days):
+    # Whole-hour, two-hour bookings that never double-book a venue or an
+    # artist, which the show_*_no_overlap constraints would reject.
+    span = (past_days + future_days) * 24
+    first_hour = now - timedelta(days=past_days)
+    booked = set()
+    for _ in range(count):
+        for attempt in range(10):
+            venue_id = rng.choice(venue_ids)
+            artist_id = rng.choice(artist_ids)
+            hour = rng.randrange(span - 1)
+            hours = (hour, hour + 1)
+            if not any(('v', venue_id, h) in booked or ('a', artist_id, h) in booked
+                       for h in hours):
+                break
+        else:
+            continue
+        for h in hours:
+            booked.add(('v', venue_id, h))
+            booked.add(('a', artist_id, h))
+        yield {
+            'venue_id': venue_id,
+            'artist_id': artist_id,
+            'start_time': first_hour + timedelta(hours=hour),
+            'duration_minutes': 120,
+        }
+
+
+def chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def load(db, table, rows, chunk_size):
+    count = 0
+    for chunk in chunks(rows, chunk_size):
+        db.session.execute(insert(table), chunk)
+        count += len(chunk)
+    db.session.commit()
+    return count
+
+
+def seed(db, args):
+    import directory
+    from models import Artist, Show, Venue
+
+    rng = random.Random(args.seed)
+    all_states = [value for value, label in VenueForm.state.kwargs['choices']]
+    states = rng.sample(all_states, min(args.states, len(all_states)))
+    genres = genre_choices(VenueForm)
+    # Anchored to the hour so reruns within the hour are identical.
+    now = datetime.now().replace(minute=0, second=0, microsecond=0)
+
+    if not args.keep:
+        db.session.execute(text('TRUNCATE show, "Venue", "Artist" RESTART IDENTITY CASCADE'))
+        db.session.commit()
+
+    counts = {
+        'venues': load(db, Venue.__table__, venues(rng, args.venues, states, genres), args.chunk_size),
+        'artists': load(db, Artist.__table__, artists(rng, args.artists, states, genres), args.chunk_size),
+    }
+    venue_ids = [row[0] for row in db.session.query(Venue.id)]
+    artist_ids = [row[0] for row in db.session.query(Artist.id)]
+    counts['shows'] = load(db, Show.__table__, shows(
+        rng, args.shows, venue_ids, artist_ids, now, args.past_days, args.future_days),
+        args.chunk_size)
+    db.session.execute(text('ANALYZE'))
+    db.session.commit()
+    # /venues reads the materialized view, which knows nothing of the new
+    # rows until it is refreshed.
+    directory.refresh()
+    return counts
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    from app import create_app
+    from models import db
+    app = create_app()
+    with app.app_context():
+        counts = seed(db, args)
+    print('seeded %(venues)d venues, %(artists)d artists, %(shows)d shows' % counts)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+import argparse
+
+from benchmarks.report import write_report
+from benchmarks.run import http_phase, routes, sample_ids
+
+#----------------------------------------------------------------------------#
+# Sync vs async serving benchmark.
+#----------------------------------------------------------------------------#
+# Start the same code both ways against the same database, e.g.
+#
+#   gunicorn 'app:create_app()' --workers 1 --threads 8 --bind :5000
+#   hypercorn asgi:app --workers 1 --bind :8000
+#
+# then load both with the routes asgi.py serves asynchronously, at rising
+# concurrency. One worker process each, so the report shows what a process
+# can sustain rather than how many were started.
+
+ASYNC_ROUTES = ('index', 'venues', 'artists', 'shows', 'show_venue', 'show_artist',
+                'search_venues', 'search_artists')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Compare the sync and async serving modes.')
+    parser.add_argument('--sync-url', required=True)
+    parser.add_argument('--async-url', required=True)
+    parser.add_argument('--concurrency', default='8,32,128',
+                        help='Comma-separated client concurrency levels.')
+    parser.add_argument('--duration', type=float, default=15.0,
+                        help='Seconds of load per route, mode and concurrency level.')
+    parser.add_argument('--output', default='-', help="JSON report path ('-' for stdout).")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    from app import create_app
+    from models import db
+    app = create_app()
+
+    with app.app_context():
+        venue_id, artist_id = sample_ids(db)
+    route_list = [route for route in routes(venue_id, artist_id) if route[0] in ASYNC_ROUTES]
+
+    results = {}
+    for concurrency in [int(level) for level in args.concurrency.split(',')]:
+        level = results[str(concurrency)] = {}
+        for mode, url in (('sync', args.sync_url), ('async', args.async_url)):
+            level[mode] = http_phase(url, route_list, concurrency, args.duration)
+        level['async_speedup'] = dict(
+            (name, speedup(level['sync'][name], level['async'][name]))
+            for name, method, path, data in route_list)
+
+    write_report(args, {'concurrency': results})
+
+
+def speedup(sync, async_):
+    # Throughput ratio; above 1 means the async mode served more requests.
+    if not sync.get('throughput_rps') or not async_.get('throughput_rps'):
+        return None
+    return round(async_['throughput_rps'] / sync['throughput_rps'], 2)
+
+
+if __name__ == '__main__':
+    main()
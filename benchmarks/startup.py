@@ -0,0 +1,93 @@
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.report import write_report
+
+#----------------------------------------------------------------------------#
+# Worker startup benchmark.
+#----------------------------------------------------------------------------#
+# Starts fresh interpreters and times what a new worker goes through: importing
+# app.py, create_app(), and the first request (which compiles its templates
+# unless they are preloaded or in the bytecode cache). `-X importtime` output
+# is summed per module to show where import time goes.
+
+PROBE = '''
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+application = app.create_app()
+created = time.perf_counter()
+response = application.test_client().get('/')
+response.get_data()
+served = time.perf_counter()
+print(json.dumps({
+    'import_seconds': imported - started,
+    'create_app_seconds': created - imported,
+    'first_request_seconds': served - created,
+    'status': response.status_code,
+}))
+'''
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Measure worker startup time.')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--top', type=int, default=15,
+                        help='Slowest modules to list from -X importtime.')
+    parser.add_argument('--output', default='-', help="JSON report path ('-' for stdout).")
+    return parser.parse_args(argv)
+
+
+def probe():
+    started = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE],
+        capture_output=True, text=True, check=True)
+    timings = json.loads(process.stdout.strip().splitlines()[-1])
+    timings['process_seconds'] = time.perf_counter() - started
+    return timings, import_times(process.stderr)
+
+
+def import_times(stderr):
+    # "import time: self [us] | cumulative | imported package"
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    runs, modules = [], {}
+    for _ in range(args.runs):
+        timings, imports = probe()
+        runs.append(timings)
+        for name, (self_us, cumulative_us) in imports.items():
+            modules.setdefault(name, []).append(self_us)
+
+    keys = ('import_seconds', 'create_app_seconds', 'first_request_seconds', 'process_seconds')
+    summary = dict(
+        (key.replace('_seconds', '_ms'), {
+            'median': round(statistics.median(run[key] for run in runs) * 1000, 3),
+            'max': round(max(run[key] for run in runs) * 1000, 3),
+        }) for key in keys)
+    slowest = sorted(modules.items(), key=lambda item: -statistics.median(item[1]))[:args.top]
+
+    sections = {
+        'startup': summary,
+        'slowest_imports_ms': dict(
+            (name, round(statistics.median(times) / 1000.0, 3)) for name, times in slowest),
+    }
+    write_report(args, sections)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import Counter
+from models import Artist, Venue
+
+#----------------------------------------------------------------------------#
+# Response cache.
+#----------------------------------------------------------------------------#
+# A small read-through cache for the payloads behind the venue and artist
+# pages. The backend is chosen with CACHE_TYPE:
+#
+#   'lru'   - in-process, bounded by CACHE_MAX_ENTRIES (the default)
+#   'redis' - any Redis-compatible server at CACHE_REDIS_URL, shared by all
+#             workers (needs the `redis` package)
+#   'null'  - caching disabled
+#
+# Every entry expires after at most CACHE_DEFAULT_TIMEOUT seconds; the write
+# paths delete the keys they affect so pages never show stale shows. Entries
+# are filled from the primary (routing.primary_reads) even on replica-routed
+# requests: a lagging replica read could otherwise put the pre-write page
+# straight back for the full timeout.
+
+
+class NullCache(object):
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, timeout):
+        pass
+
+    def delete(self, *keys):
+        pass
+
+    def clear(self):
+        pass
+
+
+class LRUCache(object):
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + timeout)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisCache(object):
+
+    def __init__(self, url, key_prefix='fyyur:'):
+        import redis
+        self._client = redis.Redis.from_url(url)
+        self.key_prefix = key_prefix
+
+    def get(self, key):
+        raw = self._client.get(self.key_prefix + key)
+        return None if raw is None else pickle.loads(raw)
+
+    def set(self, key, value, timeout):
+        self._client.set(self.key_prefix + key, pickle.dumps(value),
+                         ex=max(1, int(timeout)))
+
+    def delete(self, *keys):
+        if keys:
+            self._client.delete(*[self.key_prefix + key for key in keys])
+
+    def clear(self):
+        for key in self._client.scan_iter(self.key_prefix + '*'):
+            self._client.delete(key)
+
+
+class Cache(object):
+
+    def __init__(self, app=None):
+        self.backend = NullCache()
+        self.default_timeout = 300
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CACHE_TYPE', 'lru')
+        app.config.setdefault('CACHE_DEFAULT_TIMEOUT', 300)
+        app.config.setdefault('CACHE_MAX_ENTRIES', 1024)
+        app.config.setdefault('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+
+        cache_type = app.config['CACHE_TYPE']
+        if cache_type == 'lru':
+            self.backend = LRUCache(app.config['CACHE_MAX_ENTRIES'])
+        elif cache_type == 'redis':
+            self.backend = RedisCache(app.config['CACHE_REDIS_URL'])
+        elif cache_type == 'null':
+            self.backend = NullCache()
+        else:
+            raise ValueError('Unknown CACHE_TYPE %r' % cache_type)
+        self.default_timeout = app.config['CACHE_DEFAULT_TIMEOUT']
+        app.extensions['cache'] = self
+
+    def get(self, key):
+        value = self.backend.get(key)
+        # Facet counts share the cache with the venue and artist pages but
+        # are looked up on every listing, so they are counted apart.
+        kind = 'facet' if key.startswith('facets:') else 'page'
+        if value is None:
+            cache_misses.inc(kind=kind)
+        else:
+            cache_hits.inc(kind=kind)
+        return value
+
+    def set(self, key, value, timeout=None):
+        if timeout is None or timeout > self.default_timeout:
+            timeout = self.default_timeout
+        if timeout > 0:
+            self.backend.set(key, value, timeout)
+
+    def delete(self, *keys):
+        self.backend.delete(*keys)
+
+    def clear(self):
+        self.backend.clear()
+
+
+cache_hits = Counter('cache_hits_total', 'Cache lookups that found an entry.',
+                     labels=('kind',))
+cache_misses = Counter('cache_misses_total', 'Cache lookups that found nothing.',
+                       labels=('kind',))
+
+cache = Cache()
+
+
+def venue_key(venue_id):
+    return 'venue:%s' % venue_id
+
+
+def artist_key(artist_id):
+    return 'artist:%s' % artist_id
+
+
+def facet_key(model):
+    return 'facets:%s' % model.__tablename__
+
+
+def cache_timeout(upcoming_shows, current_time):
+    # A cached page must not outlive the start of its next show, when that
+    # show moves from the upcoming to the past section.
+    timeout = cache.default_timeout
+    if upcoming_shows:
+        starts_in = upcoming_shows[0]['start_time'] - current_time
+        timeout = min(timeout, starts_in.total_seconds())
+    return timeout
+
+
+def invalidate_venue(venue_id, artist_ids=None):
+    # A venue's name and image also appear on the pages of its artists.
+    if artist_ids is None:
+        artist_ids = Venue.artist_ids(venue_id)
+    cache.delete(venue_key(venue_id), facet_key(Venue), *map(artist_key, artist_ids))
+
+
+def invalidate_artist(artist_id):
+    cache.delete(artist_key(artist_id), facet_key(Artist),
+                 *map(venue_key, Artist.venue_ids(artist_id)))
+
@@ -0,0 +1,99 @@
+import hashlib
+from datetime import timezone
+
+from sqlalchemy import func, select
+
+from models import Artist, Deletions, Show, Venue
+from routing import SAFE_METHODS
+
+#----------------------------------------------------------------------------#
+# Conditional GET.
+#----------------------------------------------------------------------------#
+# The venue, artist and show pages carry a weak ETag and a Last-Modified
+# built from updated_at (kept current by the models' insert(), update(),
+# delete() and touch()) and the show counters, plus `Cache-Control:
+# no-cache` so browsers revalidate on every visit. The validators come from
+# one small indexed query; a revisit that still matches gets a 304 before the
+# page's show queries run or its template renders. Every validator is read
+# from an index or a primary key: max(updated_at) for inserts and updates, and
+# the table's row in `deletions` for deletes.
+#
+# Helpers take the request, session and response explicitly, so the Flask
+# views and the async read routes in asgi.py share them.
+
+
+def etag(*parts):
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()[:20]
+
+
+def last_modified(*values):
+    # Naive values are local time, like start_time and updated_at. HTTP
+    # dates have whole seconds.
+    values = [value.astimezone(timezone.utc).replace(microsecond=0)
+              for value in values if value is not None]
+    return max(values) if values else None
+
+
+def detail_statement(model, id):
+    return select(model.updated_at, model.upcoming_shows_count,
+                  model.past_shows_count, model.next_show_time).filter(model.id == id)
+
+
+def detail(row, current_time):
+    # A venue or artist page also changes when its next show starts, before
+    # `flask counters roll-forward` has moved the counters.
+    started = row.next_show_time is not None and row.next_show_time <= current_time
+    return (
+        etag(row.updated_at, row.upcoming_shows_count, row.past_shows_count,
+             row.next_show_time, started),
+        last_modified(row.updated_at, row.next_show_time if started else None)
+    )
+
+
+def deletions(model):
+    return select(Deletions.deletes).filter(
+        Deletions.table_name == model.__tablename__).scalar_subquery()
+
+
+def listing_statement(model):
+    return select(deletions(model), select(func.max(model.updated_at)).scalar_subquery())
+
+
+def listing(row, *extra):
+    deletes, updated_at = row
+    return etag(deletes, updated_at, *extra), last_modified(updated_at, *extra)
+
+
+def shows_statement():
+    # A deleted venue or artist has no shows left to list.
+    return select(
+        deletions(Show),
+        select(func.max(Show.updated_at)).scalar_subquery(),
+        select(func.max(Venue.updated_at)).scalar_subquery(),
+        select(func.max(Artist.updated_at)).scalar_subquery(),
+    )
+
+
+def shows(row):
+    deletes, *updated = row
+    return etag(deletes, *updated), last_modified(*updated)
+
+
+def is_fresh(request, session, tag, modified):
+    # Flashed messages are rendered once, so a page with any pending is
+    # always sent in full.
+    if request.method not in SAFE_METHODS or '_flashes' in session:
+        return False
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(tag)
+    if request.if_modified_since and modified is not None:
+        return modified <= request.if_modified_since
+    return False
+
+
+def validate(response, tag, modified):
+    response.set_etag(tag, weak=True)
+    if modified is not None:
+        response.last_modified = modified
+    response.cache_control.no_cache = True
+    return response
@@ -0,0 +1,54 @@
+import click
+from flask.cli import AppGroup
+from sqlalchemy import text
+
+from models import db
+
+#----------------------------------------------------------------------------#
+# Show counters.
+#----------------------------------------------------------------------------#
+# Venue and Artist carry upcoming_shows_count, past_shows_count and
+# next_show_time. Triggers on `show` keep them right on every insert, update
+# and delete; what they cannot see is time passing, so `roll-forward` recounts
+# the venues and artists whose next show has started. Past counts include the
+# shows in show_archive. Recounted rows get a new updated_at, since their
+# pages have changed. Run it from cron, e.g.
+#
+#   * * * * * cd /srv/fyyur && flask counters roll-forward
+
+counters_cli = AppGroup('counters', help='Maintain the denormalized show counters.')
+
+RECOUNT = '''
+UPDATE "%(table)s" t SET (upcoming_shows_count, past_shows_count, next_show_time) = (
+    SELECT count(*) FILTER (WHERE s.start_time > LOCALTIMESTAMP),
+           count(*) FILTER (WHERE s.start_time <= LOCALTIMESTAMP)
+               + (SELECT count(*) FROM show_archive a WHERE a.%(owner)s = t.id),
+           min(s.start_time) FILTER (WHERE s.start_time > LOCALTIMESTAMP)
+    FROM show s WHERE s.%(owner)s = t.id
+), updated_at = LOCALTIMESTAMP
+'''
+
+OWNERS = (('Venue', 'venue_id'), ('Artist', 'artist_id'))
+
+
+def recount(where=''):
+    updated = {}
+    for table, owner in OWNERS:
+        result = db.session.execute(text(RECOUNT % {'table': table, 'owner': owner} + where))
+        updated[table] = result.rowcount
+    db.session.commit()
+    return updated
+
+
+@counters_cli.command('roll-forward')
+def roll_forward():
+    """Move shows that have started from upcoming to past."""
+    updated = recount('WHERE t.next_show_time <= LOCALTIMESTAMP')
+    click.echo('rolled forward %(Venue)d venues, %(Artist)d artists' % updated)
+
+
+@counters_cli.command('rebuild')
+def rebuild():
+    """Recount every venue and artist from the show and archive tables."""
+    updated = recount()
+    click.echo('recounted %(Venue)d venues, %(Artist)d artists' % updated)
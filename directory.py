@@ -0,0 +1,140 @@
+import threading
+import time
+from datetime import datetime, timezone
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import DateTime, Integer, String, column, select, table, text
+
+from models import db
+
+#----------------------------------------------------------------------------#
+# Venue directory.
+#----------------------------------------------------------------------------#
+# /venues reads the `venue_directory` materialized view: venues with their
+# (state, city) and upcoming show count, computed once per refresh instead of
+# per visitor. The view is refreshed CONCURRENTLY, so readers are never
+# blocked:
+#
+#   - when a worker starts serving, unless it was refreshed within the last
+#     interval, and then every DIRECTORY_REFRESH_INTERVAL seconds by a
+#     background thread in each worker (0 disables it; run `flask directory
+#     refresh` from cron instead),
+#   - shortly after a venue or show is written, via request_refresh().
+#     Bursts of writes are coalesced into one refresh per
+#     DIRECTORY_REFRESH_DEBOUNCE seconds.
+
+directory_cli = AppGroup('directory', help='Maintain the venue directory view.')
+
+venue_directory = table(
+    'venue_directory',
+    column('id', Integer),
+    column('name', String),
+    column('city', String),
+    column('state', String),
+    column('num_upcoming_shows', Integer),
+    column('refreshed_at', DateTime(timezone=True)),
+)
+
+
+def statement():
+    c = venue_directory.c
+    return select(c.id, c.name, c.city, c.state, c.num_upcoming_shows)
+
+
+def refreshed_at_statement():
+    return select(venue_directory.c.refreshed_at).limit(1)
+
+
+def query():
+    return db.session.query(*statement().selected_columns)
+
+
+def refreshed_at():
+    return db.session.execute(refreshed_at_statement()).scalar()
+
+
+def staleness(refreshed):
+    if refreshed is None:
+        return None
+    return max(0.0, (datetime.now(timezone.utc) - refreshed).total_seconds())
+
+
+def refresh():
+    # Always on the primary; a replica cannot refresh its own views.
+    with db.engine.begin() as connection:
+        connection.execute(text('REFRESH MATERIALIZED VIEW CONCURRENTLY venue_directory'))
+
+
+class Refresher(object):
+
+    def __init__(self):
+        self.app = None
+        self._wanted = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def init_app(self, app):
+        app.config.setdefault('DIRECTORY_REFRESH_INTERVAL', 300)
+        app.config.setdefault('DIRECTORY_REFRESH_DEBOUNCE', 5)
+        self.app = app
+        if app.config['DIRECTORY_REFRESH_INTERVAL']:
+            # Started from the first request rather than here, so a
+            # preforking server starts one thread per worker, after the fork.
+            app.before_request(self.start)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='venue-directory-refresh', daemon=True)
+                self._thread.start()
+
+    def request_refresh(self):
+        self._wanted.set()
+        self.start()
+
+    @staticmethod
+    def stale(interval):
+        # Another worker that started at the same time may have refreshed
+        # it already.
+        age = staleness(refreshed_at())
+        return age is None or interval is None or age >= interval
+
+    def _run(self):
+        interval = self.app.config['DIRECTORY_REFRESH_INTERVAL'] or None
+        debounce = self.app.config['DIRECTORY_REFRESH_DEBOUNCE']
+        # A fresh deploy or seed may have left the view behind the tables;
+        # don't serve it for a whole interval first.
+        try:
+            with self.app.app_context():
+                if self.stale(interval):
+                    refresh()
+        except Exception:
+            self.app.logger.exception('venue directory refresh failed')
+        while True:
+            if self._wanted.wait(interval):
+                time.sleep(debounce)
+            self._wanted.clear()
+            try:
+                with self.app.app_context():
+                    refresh()
+            except Exception:
+                self.app.logger.exception('venue directory refresh failed')
+
+
+refresher = Refresher()
+
+
+def request_refresh():
+    refresher.request_refresh()
+
+
+@directory_cli.command('refresh')
+def refresh_command():
+    """Refresh the venue directory view now."""
+    started = time.monotonic()
+    refresh()
+    click.echo('venue directory refreshed in %.2fs' % (time.monotonic() - started), err=True)
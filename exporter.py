@@ -0,0 +1,182 @@
+import csv
+import gzip
+import sys
+import time
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import ARRAY, select
+
+from api import dumps
+from importer import ARTISTS, SHOWS, VENUES
+from models import db, Artist, Show, ShowArchive, Venue
+
+#----------------------------------------------------------------------------#
+# Bulk export.
+#----------------------------------------------------------------------------#
+# flask export venues|artists|shows|show-details|show-archive
+#
+# Rows are read from a server-side cursor and written in fixed-size record
+# batches, so memory stays flat however large the table is. `show-details`
+# is the joined show view rendered by Show.detail().
+
+
+def importable(model, spec, exclude=()):
+    # Columns the importer reads are named after their form fields
+    # (website_link, seeking_description, ...), so an export loads back
+    # through `flask import` unchanged. Other columns keep their own names.
+    names = dict((column, field) for field, column in spec.fields)
+    return select(*[column.label(names.get(column.key, column.key))
+                    for column in model.__table__.c if column.key not in exclude])
+
+
+def venues_statement():
+    return importable(Venue, VENUES).order_by(Venue.id)
+
+
+def artists_statement():
+    return importable(Artist, ARTISTS).order_by(Artist.id)
+
+
+def shows_statement():
+    # `during` is generated from start_time and duration_minutes.
+    return importable(Show, SHOWS, exclude=('during',)).order_by(Show.id)
+
+
+def show_archive_statement():
+    return select(ShowArchive.__table__).order_by(ShowArchive.id)
+
+
+def show_details_statement():
+    # Same fields as Show.detail(), selected as plain columns so millions of
+    # rows do not go through the ORM.
+    return select(
+        Show.venue_id,
+        Venue.name.label('venue_name'),
+        Show.artist_id,
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link'),
+        Show.start_time
+    ).join(Venue, Venue.id == Show.venue_id).join(
+        Artist, Artist.id == Show.artist_id).order_by(Show.id)
+
+
+SOURCES = {
+    'venues': venues_statement,
+    'artists': artists_statement,
+    'shows': shows_statement,
+    'show-details': show_details_statement,
+    'show-archive': show_archive_statement,
+}
+
+EXTENSIONS = {'csv': 'csv', 'ndjson': 'ndjson', 'parquet': 'parquet'}
+
+
+@click.command('export')
+@click.argument('source', type=click.Choice(sorted(SOURCES)))
+@click.option('--format', 'fmt', type=click.Choice(sorted(EXTENSIONS)),
+              default='csv', show_default=True)
+@click.option('--output', '-o', help="Output file ('-' for stdout); defaults to SOURCE.FORMAT.")
+@click.option('--batch-size', default=10000, show_default=True)
+@click.option('--compress', is_flag=True,
+              help='gzip CSV/NDJSON output; zstd-compress Parquet pages.')
+@with_appcontext
+def export_command(source, fmt, output, batch_size, compress):
+    """Stream a table or the show view to CSV, NDJSON or Parquet."""
+    statement = SOURCES[source]()
+    if output is None:
+        output = '%s.%s%s' % (source, EXTENSIONS[fmt],
+                              '.gz' if compress and fmt != 'parquet' else '')
+
+    writer = {'csv': CsvWriter, 'ndjson': NdjsonWriter, 'parquet': ParquetWriter}[fmt](
+        output, statement.selected_columns, compress)
+    started = time.monotonic()
+    count = 0
+    result = db.session.execute(statement, execution_options={'yield_per': batch_size})
+    try:
+        for batch in result.mappings().partitions():
+            writer.write(batch)
+            count += len(batch)
+            elapsed = max(time.monotonic() - started, 1e-6)
+            click.echo('%d rows (%.0f rows/s)' % (count, count / elapsed), err=True)
+    finally:
+        result.close()
+        writer.close()
+
+
+def open_text(output, compress):
+    if output == '-':
+        return sys.stdout
+    if compress:
+        return gzip.open(output, 'wt', newline='', encoding='utf-8')
+    return open(output, 'w', newline='', encoding='utf-8')
+
+
+class CsvWriter(object):
+
+    def __init__(self, output, columns, compress):
+        self.file = open_text(output, compress)
+        self.writer = csv.DictWriter(self.file, [column.key for column in columns])
+        self.writer.writeheader()
+
+    def write(self, batch):
+        # Lists are joined with ';', as `flask import` splits them. Together
+        # with the form-field column names, venues, artists and shows exports
+        # can be imported again as they are.
+        self.writer.writerows(
+            dict((key, ';'.join(value) if isinstance(value, list) else value)
+                 for key, value in row.items())
+            for row in batch)
+
+    def close(self):
+        if self.file is not sys.stdout:
+            self.file.close()
+
+
+class NdjsonWriter(object):
+
+    def __init__(self, output, columns, compress):
+        self.file = open_text(output, compress)
+
+    def write(self, batch):
+        self.file.writelines(dumps(dict(row)) + '\n' for row in batch)
+
+    def close(self):
+        if self.file is not sys.stdout:
+            self.file.close()
+
+
+class ParquetWriter(object):
+
+    def __init__(self, output, columns, compress):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise click.ClickException('Parquet export needs the pyarrow package.')
+        self.pyarrow = pyarrow
+        self.schema = pyarrow.schema(
+            [(column.key, self.arrow_type(column.type)) for column in columns])
+        self.writer = pyarrow.parquet.ParquetWriter(
+            output, self.schema, compression='zstd' if compress else 'none')
+
+    def arrow_type(self, column_type):
+        pa = self.pyarrow
+        if isinstance(column_type, ARRAY):
+            return pa.list_(pa.string())
+        python_type = column_type.python_type
+        if python_type is bool:
+            return pa.bool_()
+        if python_type is int:
+            return pa.int64()
+        if python_type is datetime:
+            return pa.timestamp('us')
+        return pa.string()
+
+    def write(self, batch):
+        self.writer.write_table(self.pyarrow.Table.from_pylist(
+            [dict(row) for row in batch], schema=self.schema))
+
+    def close(self):
+        self.writer.close()
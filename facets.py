@@ -0,0 +1,54 @@
+from flask import abort
+from sqlalchemy import cast, func, select, true
+from sqlalchemy.dialects.postgresql import array
+
+from cache import cache, facet_key
+from models import db
+from routing import primary_reads
+
+#----------------------------------------------------------------------------#
+# Genre facets.
+#----------------------------------------------------------------------------#
+# /venues and /artists take repeated ?genre= parameters and list only rows
+# whose genres contain all of them (`genres @> ARRAY[...]`, served by the GIN
+# indexes on the genres columns). The sidebar shows how many rows carry each
+# genre offered by the form; those counts come from one aggregate over the
+# unnested arrays and are cached until a venue or artist is written.
+
+
+def requested(args, choices):
+    genres = args.getlist('genre')
+    if not set(genres) <= set(choices):
+        abort(400)
+    return genres
+
+
+def contains(model, genres):
+    # A bare ARRAY['Jazz'] is text[], and varchar[] @> text[] has no
+    # operator; cast the literal to the column's own array type.
+    return model.genres.op('@>')(cast(array(genres), model.genres.type))
+
+
+def statement(model, choices):
+    # FROM "Venue" JOIN LATERAL unnest("Venue".genres) AS genres(genre) ON
+    # true. An explicit join, rather than listing the unnest in FROM, tells
+    # SQLAlchemy's FROM linter the two are linked, so it does not warn about
+    # a cartesian product.
+    genres = func.unnest(model.genres).table_valued('genre').render_derived('genres').lateral()
+    return select(genres.c.genre, func.count()).select_from(model).join(genres, true()).where(
+        genres.c.genre.in_(choices)).group_by(genres.c.genre)
+
+
+def from_rows(choices, rows):
+    found = dict((genre, count) for genre, count in rows)
+    return [(genre, found.get(genre, 0)) for genre in choices]
+
+
+def counts(model, choices):
+    key = facet_key(model)
+    result = cache.get(key)
+    if result is None:
+        with primary_reads():
+            result = from_rows(choices, db.session.execute(statement(model, choices)))
+        cache.set(key, result)
+    return result
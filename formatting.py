@@ -0,0 +1,75 @@
+import functools
+import threading
+
+#----------------------------------------------------------------------------#
+# Datetime formatting.
+#----------------------------------------------------------------------------#
+# babel re-parses a pattern string on every format_datetime() call, which
+# adds up on /shows with thousands of tiles. Named formats are compiled once
+# here, datetimes skip dateutil entirely, and formatted output is memoized in
+# a bounded LRU keyed on (value, format). babel and dateutil are imported on
+# first use, so importing the app and running CLI commands stays cheap.
+
+FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+
+class DateTimeFormatter(object):
+
+    def __init__(self, formats=FORMATS, locale='en', cache_size=4096):
+        self.formats = dict(formats)
+        self.locale_name = locale
+        self.locale = None
+        self.patterns = {}
+        self._lock = threading.Lock()
+        self._cached = functools.lru_cache(maxsize=cache_size)(self._format)
+
+    def register(self, name, pattern):
+        from babel.dates import parse_pattern
+        with self._lock:
+            self.formats[name] = pattern
+            self.patterns[name] = parse_pattern(pattern)
+
+    def pattern(self, format):
+        # Named formats are compiled on first use; anything else is a babel
+        # pattern (or one of babel's own 'short', 'long', ...).
+        compiled = self.patterns.get(format)
+        if compiled is None:
+            if format in ('short', 'long'):
+                return format
+            self.register(format, self.formats.get(format, format))
+            compiled = self.patterns[format]
+        return compiled
+
+    def format(self, value, format='medium'):
+        if value is None:
+            return ''
+        return self._cached(value, format)
+
+    def format_many(self, values, format='medium'):
+        return [self.format(value, format) for value in values]
+
+    def _format(self, value, format):
+        import babel.dates
+        if isinstance(value, str):
+            import dateutil.parser
+            value = dateutil.parser.parse(value)
+        if self.locale is None:
+            self.locale = babel.Locale.parse(self.locale_name)
+        return babel.dates.format_datetime(value, self.pattern(format), locale=self.locale)
+
+    def cache_info(self):
+        return self._cached.cache_info()
+
+
+datetime_formatter = DateTimeFormatter()
+
+
+def format_datetime(value, format='medium'):
+    return datetime_formatter.format(value, format)
+
+
+def format_datetimes(values, format='medium'):
+    return datetime_formatter.format_many(values, format)
@@ -1,8 +1,8 @@
 from datetime import datetime
 from xml.dom import ValidationErr
 from flask_wtf import FlaskForm
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, SubmitField
-from wtforms.validators import DataRequired, AnyOf, URL, ValidationError, Regexp
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, SubmitField, IntegerField
+from wtforms.validators import DataRequired, AnyOf, URL, ValidationError, Regexp, NumberRange
 
 class ShowForm(FlaskForm):
     artist_id = StringField(
@@ -16,6 +16,11 @@ class ShowForm(FlaskForm):
         validators=[DataRequired()],
         default= datetime.today()
     )
+    duration_minutes = IntegerField(
+        'duration_minutes',
+        validators=[NumberRange(min=1, max=24 * 60)],
+        default=120
+    )
     submit = SubmitField("Create Show")
 
 class VenueForm(FlaskForm):
@@ -256,3 +261,8 @@ class ArtistForm(FlaskForm):
             'seeking_description'
      )
     submit = SubmitField("Create Artist") 
+
+
+def genre_choices(form_class):
+    # The genre values offered by a form, e.g. genre_choices(VenueForm).
+    return [value for value, label in form_class.genres.kwargs['choices']]
@@ -0,0 +1,402 @@
+import csv
+import io
+import json
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import AppGroup
+from werkzeug.datastructures import MultiDict
+from wtforms import BooleanField, DateTimeField
+from wtforms.validators import DataRequired
+
+from cache import cache
+import directory
+from forms import ArtistForm, ShowForm, VenueForm
+from models import MAX_SHOW_MINUTES, db
+
+#----------------------------------------------------------------------------#
+# Bulk import.
+#----------------------------------------------------------------------------#
+# flask import venues|artists|shows FILE
+#
+# Records are read from CSV or NDJSON using the form field names (plus an
+# optional `id`), validated with the same VenueForm/ArtistForm/ShowForm rules
+# as the web forms, and loaded in batches: each batch is COPYed into a
+# temporary staging table and merged into the real table with
+# INSERT ... ON CONFLICT (id) DO UPDATE (or, for the partitioned show table,
+# a DELETE of the staged ids followed by a plain INSERT), so re-importing a
+# file updates rows instead of duplicating them. Rejected records are reported
+# and skipped; they never abort the batch. In CSV files, separate multiple genres with ';'.
+
+import_cli = AppGroup('import', help='Bulk-load venues, artists and shows.')
+
+
+class Spec(object):
+
+    def __init__(self, form, table, fields, checks=(), batch_check=None, replace=False,
+                 owners=()):
+        self.form = form
+        self.table = table
+        # (form field, table column) pairs, in COPY order after `id`.
+        self.fields = fields
+        # (form field, message, condition) triples: a staged row is merged
+        # only if every condition holds, and is otherwise reported against
+        # the field with the message of each condition it fails.
+        self.checks = checks
+        # (form field, message, function) for records that clash with another
+        # record of the same batch: the function takes the staged rows that
+        # passed `checks`, as dicts in line order, and returns the lines to
+        # reject.
+        self.batch_check = batch_check
+        # ON CONFLICT needs a unique index on `id` alone, which a
+        # partitioned table cannot have.
+        self.replace = replace
+        # (table, column) pairs of the rows whose pages list these records;
+        # their updated_at moves forward with each batch.
+        self.owners = owners
+
+    @property
+    def columns(self):
+        return ['id'] + [column for field, column in self.fields]
+
+    @property
+    def conditions(self):
+        return ' AND '.join('(%s)' % condition for field, message, condition in self.checks)
+
+
+VENUES = Spec(VenueForm, 'Venue', [
+    ('name', 'name'),
+    ('city', 'city'),
+    ('state', 'state'),
+    ('address', 'address'),
+    ('phone', 'phone'),
+    ('image_link', 'image_link'),
+    ('facebook_link', 'facebook_link'),
+    ('genres', 'genres'),
+    ('website_link', 'website'),
+    ('seeking_talent', 'seeking_talent'),
+    ('seeking_description', 'description'),
+])
+
+ARTISTS = Spec(ArtistForm, 'Artist', [
+    ('name', 'name'),
+    ('city', 'city'),
+    ('state', 'state'),
+    ('phone', 'phone'),
+    ('genres', 'genres'),
+    ('image_link', 'image_link'),
+    ('facebook_link', 'facebook_link'),
+    ('website_link', 'website'),
+    ('seeking_venue', 'seeking_venue'),
+    ('seeking_description', 'seeking_description'),
+])
+
+
+def earlier_overlaps(staged):
+    # In line order, a show is kept unless it overlaps a show already kept at
+    # the same venue or with the same artist, so a line that is rejected
+    # never takes a later one with it.
+    kept = {}
+    rejected = []
+    for row in staged:
+        start = row['start_time']
+        end = start + timedelta(minutes=row['duration_minutes'])
+        keys = [('venue', row['venue_id']), ('artist', row['artist_id'])]
+        if any(start < other_end and other_start < end
+               for key in keys for other_start, other_end in kept.get(key, ())):
+            rejected.append(row['line'])
+            continue
+        for key in keys:
+            kept.setdefault(key, []).append((start, end))
+    return rejected
+
+
+STAGED_DURING = ("tsrange(%(row)s.start_time, %(row)s.start_time "
+                 "+ %(row)s.duration_minutes * interval '1 minute', '[)')")
+
+# Shows whose venue or artist does not exist, or that would be double-booked,
+# are left out of the merge and reported as rejected. A single overlap would
+# otherwise fail the exclusion constraints and with them the whole batch.
+# Existing shows are matched with the show's own id left out (it is replaced)
+# and start_time bounded by MAX_SHOW_MINUTES, so only the partitions
+# around it are read; of two overlapping staged shows the earlier line wins.
+SHOWS = Spec(ShowForm, 'show', [
+    ('artist_id', 'artist_id'),
+    ('venue_id', 'venue_id'),
+    ('start_time', 'start_time'),
+    ('duration_minutes', 'duration_minutes'),
+], checks=[
+    ('artist_id', 'Artist does not exist.',
+     'EXISTS (SELECT 1 FROM "Artist" a WHERE a.id = staging.artist_id)'),
+    ('venue_id', 'Venue does not exist.',
+     'EXISTS (SELECT 1 FROM "Venue" v WHERE v.id = staging.venue_id)'),
+    ('start_time', 'Overlaps another show at this venue or by this artist.', '''
+     NOT EXISTS (SELECT 1 FROM show s
+                 WHERE (s.venue_id = staging.venue_id OR s.artist_id = staging.artist_id)
+                   AND s.id IS DISTINCT FROM staging.id
+                   AND s.start_time > staging.start_time - interval '%(longest)d minutes'
+                   AND s.start_time < upper(%(staging)s)
+                   AND s.during && %(staging)s)''' % {
+        'staging': STAGED_DURING % {'row': 'staging'}, 'longest': MAX_SHOW_MINUTES}),
+], batch_check=('start_time', 'Overlaps an earlier show in this file.', earlier_overlaps),
+    replace=True, owners=[('Venue', 'venue_id'), ('Artist', 'artist_id')])
+
+FALSE_VALUES = ('', '0', 'false', 'f', 'no', 'n', 'off')
+
+
+def command(name, spec):
+    @import_cli.command(name)
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']),
+                  help='Input format; guessed from the file extension by default.')
+    @click.option('--batch-size', default=5000, show_default=True)
+    @click.option('--rejects', type=click.File('w'),
+                  help='Write rejected records here as NDJSON instead of stderr.')
+    def run(path, fmt, batch_size, rejects):
+        load(spec, path, fmt or guess_format(path), batch_size, rejects)
+    run.__doc__ = 'Import %s from a CSV or NDJSON file.' % name
+    return run
+
+
+import_venues = command('venues', VENUES)
+import_artists = command('artists', ARTISTS)
+import_shows = command('shows', SHOWS)
+
+
+def guess_format(path):
+    return 'ndjson' if path.endswith(('.ndjson', '.jsonl', '.json')) else 'csv'
+
+
+def read_records(path, fmt):
+    with open(path, newline='', encoding='utf-8') as source:
+        if fmt == 'csv':
+            for line, record in enumerate(csv.DictReader(source), start=2):
+                yield line, record
+        else:
+            for line, text in enumerate(source, start=1):
+                if text.strip():
+                    yield line, json.loads(text)
+
+
+def load(spec, path, fmt, batch_size, rejects):
+    started = time.monotonic()
+    totals = {'read': 0, 'merged': 0, 'rejected': 0}
+    # (line, record, row) for each record that passed validation.
+    batch = []
+
+    def flush():
+        try:
+            merged, failed = merge(spec, [(line, row) for line, record, row in batch])
+        except db.engine.dialect.dbapi.Error as error:
+            click.echo('batch of %d rows failed: %s' % (len(batch), error), err=True)
+            merged, failed = 0, {}
+            totals['rejected'] += len(batch)
+        records = dict((line, record) for line, record, row in batch)
+        for line, errors in sorted(failed.items()):
+            report(rejects, line, records[line], errors)
+        totals['merged'] += merged
+        totals['rejected'] += len(failed)
+        del batch[:]
+        elapsed = max(time.monotonic() - started, 1e-6)
+        click.echo('%(read)d read, %(merged)d merged, %(rejected)d rejected' % totals
+                   + ' (%.0f rows/s)' % (totals['read'] / elapsed), err=True)
+
+    for line, record in read_records(path, fmt):
+        totals['read'] += 1
+        row, errors = validate(spec, record)
+        if errors:
+            totals['rejected'] += 1
+            report(rejects, line, record, errors)
+            continue
+        batch.append((line, record, row))
+        if len(batch) >= batch_size:
+            flush()
+    if batch or not totals['read']:
+        flush()
+    cache.clear()
+    directory.refresh()
+
+
+def validate(spec, record):
+    formdata = MultiDict()
+    form_class = spec.form
+    # Timestamps as `flask export` and the API write them (ISO 8601, with any
+    # microseconds), kept at full precision after the form has checked them.
+    timestamps = {}
+    for field, column in spec.fields:
+        value = record.get(field)
+        if value is None:
+            continue
+        field_class = getattr(form_class, field).field_class
+        if field == 'genres' and isinstance(value, str):
+            value = [genre.strip() for genre in value.split(';') if genre.strip()]
+        if issubclass(field_class, BooleanField):
+            if str(value).strip().lower() in FALSE_VALUES:
+                continue
+            value = 'y'
+        if issubclass(field_class, DateTimeField) and isinstance(value, str):
+            try:
+                timestamps[field] = datetime.fromisoformat(value.strip())
+                value = timestamps[field].strftime('%Y-%m-%d %H:%M:%S')
+            except ValueError:
+                pass
+        for item in value if isinstance(value, list) else [value]:
+            formdata.add(field, str(item))
+
+    form = form_class(formdata=formdata, meta={'csrf': False})
+    errors = {} if form.validate() else dict(form.errors)
+    # The web forms insist on every link, but the tables hold venues and
+    # artists without one; a blank optional field is left empty.
+    for field, column in spec.fields:
+        if blank(record.get(field)) and not required(form[field]):
+            errors.pop(field, None)
+
+    row = [integer(record.get('id') or None, 'id', errors)]
+    for field, column in spec.fields:
+        value = timestamps.get(field, form[field].data)
+        if column in ('artist_id', 'venue_id'):
+            value = integer(value, field, errors)
+        elif blank(record.get(field)) and isinstance(value, str):
+            value = None
+        row.append(value)
+    return row, errors
+
+
+def blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def required(field):
+    return any(isinstance(validator, DataRequired) for validator in field.validators)
+
+
+def integer(value, field, errors):
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        errors.setdefault(field, []).append('Not a valid integer.')
+
+
+def report(rejects, line, record, errors):
+    entry = json.dumps({'line': line, 'errors': errors, 'record': record}, default=str)
+    if rejects is not None:
+        rejects.write(entry + '\n')
+    else:
+        click.echo(entry, err=True)
+
+
+def copy_value(value):
+    if value is None:
+        return '\\N'
+    if isinstance(value, list):
+        return '{' + ','.join(
+            '"' + item.replace('\\', '\\\\').replace('"', '\\"') + '"' for item in value
+        ) + '}'
+    return value
+
+
+def merge(spec, rows):
+    # Takes (line, row) pairs and returns the number of rows merged and the
+    # errors of the rows that failed spec.checks or spec.batch_check, keyed
+    # by line.
+    if not rows:
+        return 0, {}
+    # ON CONFLICT cannot touch the same row twice in one statement, so the
+    # last record for a repeated id wins.
+    latest = {}
+    for line, row in rows:
+        latest[row[0] if row[0] is not None else ('new', line)] = (line, row)
+    rows = list(latest.values())
+    buffer = io.StringIO()
+    # None is written as \N, COPY's NULL below, so '' stays an empty string.
+    # (The csv module quotes None as "", which COPY reads as '' rather than
+    # NULL.)
+    writer = csv.writer(buffer)
+    for line, row in rows:
+        writer.writerow([line] + [copy_value(value) for value in row])
+    buffer.seek(0)
+
+    columns = ', '.join(spec.columns)
+    updates = ', '.join(['%s = EXCLUDED.%s' % (column, column) for column in spec.columns[1:]]
+                        + ['updated_at = LOCALTIMESTAMP'])
+    table = '"%s"' % spec.table
+    connection = db.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(
+            'CREATE TEMP TABLE staging ON COMMIT DROP AS '
+            'SELECT NULL::integer AS line, %s FROM %s WITH NO DATA' % (columns, table))
+        copy_from(cursor, "COPY staging (line, %s) FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+                  % columns, buffer)
+        # Failed rows are taken out of staging before anything is merged, so
+        # the merge below reads only what passed and never checks again.
+        failed = {}
+        if spec.checks:
+            cursor.execute('SELECT line, %s FROM staging WHERE NOT (%s)' % (
+                ', '.join('(%s)' % condition for field, message, condition in spec.checks),
+                spec.conditions))
+            for line, *passed in cursor.fetchall():
+                errors = failed[line] = {}
+                for (field, message, condition), ok in zip(spec.checks, passed):
+                    if not ok:
+                        errors.setdefault(field, []).append(message)
+            unstage(cursor, failed)
+        if spec.batch_check:
+            field, message, check = spec.batch_check
+            cursor.execute('SELECT line, %s FROM staging ORDER BY line' % columns)
+            names = [column[0] for column in cursor.description]
+            clashes = check([dict(zip(names, row)) for row in cursor.fetchall()])
+            for line in clashes:
+                failed[line] = {field: [message]}
+            unstage(cursor, clashes)
+        statement = {
+            'table': table,
+            'columns': columns,
+            'values': ', '.join(spec.columns[1:]),
+            'updates': updates,
+        }
+        insert = ('INSERT INTO %(table)s (%(columns)s) '
+                  "SELECT COALESCE(id, nextval(pg_get_serial_sequence('%(table)s', 'id'))), "
+                  '%(values)s FROM staging' % statement)
+        if spec.replace:
+            # A changed start_time can move a row to another partition, so
+            # the old version is deleted rather than updated in place.
+            cursor.execute('DELETE FROM %(table)s WHERE id IN '
+                           '(SELECT id FROM staging)' % statement)
+            cursor.execute(insert)
+        else:
+            cursor.execute(insert + ' ON CONFLICT (id) DO UPDATE SET %(updates)s' % statement)
+        merged = cursor.rowcount
+        for owner, column in spec.owners:
+            cursor.execute(
+                'UPDATE "%s" SET updated_at = LOCALTIMESTAMP '
+                'WHERE id IN (SELECT %s FROM staging)' % (owner, column))
+        # Explicit ids bypass the sequence; move it past them.
+        cursor.execute(
+            "SELECT setval(pg_get_serial_sequence('%(table)s', 'id'), "
+            'GREATEST((SELECT max(id) FROM %(table)s), 1))' % {'table': table})
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+    return merged, failed
+
+
+def copy_from(cursor, statement, buffer):
+    # psycopg2 has copy_expert(); psycopg 3 (a postgresql+psycopg:// URL)
+    # streams through cursor.copy().
+    if hasattr(cursor, 'copy_expert'):
+        cursor.copy_expert(statement, buffer)
+    else:
+        with cursor.copy(statement) as copy:
+            copy.write(buffer.getvalue())
+
+
+def unstage(cursor, lines):
+    if lines:
+        cursor.execute('DELETE FROM staging WHERE line = ANY(%s)', (list(lines),))
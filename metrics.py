@@ -0,0 +1,304 @@
+import threading
+import time
+import weakref
+from contextvars import ContextVar
+
+from flask import current_app, g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+#----------------------------------------------------------------------------#
+# Metrics.
+#----------------------------------------------------------------------------#
+# A minimal in-process registry rendered in the Prometheus text exposition
+# format at /metrics. Values are per worker process.
+
+REGISTRY = []
+
+
+class Metric(object):
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels[label]) for label in self.labels)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, dict(zip(self.labels, key)), value
+
+    def render(self):
+        lines = ['# HELP %s %s' % (self.name, self.help),
+                 '# TYPE %s %s' % (self.name, self.kind)]
+        for name, labels, value in self.samples():
+            lines.append('%s%s %s' % (name, format_labels(labels), format_value(value)))
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def __init__(self, name, help, labels=(), collect=None):
+        # `collect` is called at scrape time and yields (labels, value).
+        super(Gauge, self).__init__(name, help, labels)
+        self.collect = collect
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self):
+        if self.collect is None:
+            return super(Gauge, self).samples()
+        return ((self.name, labels, value) for labels, value in self.collect())
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+    default_buckets = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+
+    def __init__(self, name, help, labels=(), buckets=None):
+        super(Histogram, self).__init__(name, help, labels)
+        self.buckets = tuple(buckets or self.default_buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0, 0.0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][index] += 1
+            state[1] += 1
+            state[2] += value
+
+    def samples(self):
+        with self._lock:
+            items = [(key, ([list(state[0]), state[1], state[2]])) for key, state in self._values.items()]
+        for key, (counts, count, total) in items:
+            labels = dict(zip(self.labels, key))
+            for bound, bucket_count in zip(self.buckets, counts):
+                yield self.name + '_bucket', dict(labels, le=format_value(bound)), bucket_count
+            yield self.name + '_bucket', dict(labels, le='+Inf'), count
+            yield self.name + '_count', labels, count
+            yield self.name + '_sum', labels, total
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{%s}' % ','.join(
+        '%s="%s"' % (key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in sorted(labels.items()))
+
+
+def format_value(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def render():
+    return '\n'.join(metric.render() for metric in REGISTRY) + '\n'
+
+
+#----------------------------------------------------------------------------#
+# Connection pool.
+#----------------------------------------------------------------------------#
+
+pool_checkout_seconds = Histogram(
+    'db_pool_checkout_seconds',
+    'Time spent waiting to check a connection out of the pool.',
+    labels=('pool',))
+
+_pools = weakref.WeakSet()
+
+
+class InstrumentedQueuePool(QueuePool):
+    # QueuePool that times every checkout, including the wait for a free
+    # connection when the pool is exhausted.
+
+    def __init__(self, *args, **kwargs):
+        super(InstrumentedQueuePool, self).__init__(*args, **kwargs)
+        _pools.add(self)
+
+    @property
+    def label(self):
+        return self.logging_name or 'default'
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super(InstrumentedQueuePool, self).connect()
+        finally:
+            pool_checkout_seconds.observe(time.perf_counter() - started, pool=self.label)
+
+    def capacity(self):
+        return self.size() + max(self._max_overflow, 0)
+
+
+def _pool_checked_out():
+    for pool in list(_pools):
+        yield {'pool': pool.label}, pool.checkedout()
+
+
+def _pool_capacity():
+    for pool in list(_pools):
+        yield {'pool': pool.label}, pool.capacity()
+
+
+def _pool_saturation():
+    for pool in list(_pools):
+        capacity = pool.capacity()
+        yield {'pool': pool.label}, float(pool.checkedout()) / capacity if capacity else 0.0
+
+
+Gauge('db_pool_checked_out', 'Connections currently checked out.',
+      labels=('pool',), collect=_pool_checked_out)
+Gauge('db_pool_capacity', 'pool_size + max_overflow.',
+      labels=('pool',), collect=_pool_capacity)
+Gauge('db_pool_saturation', 'Checked-out connections as a fraction of capacity.',
+      labels=('pool',), collect=_pool_saturation)
+
+
+#----------------------------------------------------------------------------#
+# Requests and SQL.
+#----------------------------------------------------------------------------#
+# Every statement run while handling a request is timed through engine
+# events and charged to the request's endpoint, so a route that starts issuing
+# a query per row shows up in db_queries_per_request straight away. The
+# listeners are on the Engine class, so they also see the asyncpg engines'
+# sync_engine; the tally lives in a context variable, which both the Flask
+# request and the Quart task (and the greenlet SQLAlchemy runs asyncpg in)
+# can reach.
+#
+# Rows are the driver's rowcount, except for statements executed with the
+# `count_consumed_rows` option: a streamed page reports -1 until it is read,
+# so Page and the NDJSON export count the rows they hand out instead.
+
+request_seconds = Histogram(
+    'http_request_duration_seconds',
+    'Request latency, including streamed bodies.',
+    labels=('endpoint', 'method', 'status'))
+queries_per_request = Histogram(
+    'db_queries_per_request',
+    'SQL statements executed per request.',
+    labels=('endpoint',),
+    buckets=(1, 2, 3, 5, 10, 20, 50, 100, 200, 500))
+db_seconds = Counter(
+    'db_query_seconds_total',
+    'Time spent executing SQL statements.',
+    labels=('endpoint',))
+db_queries = Counter(
+    'db_queries_total',
+    'SQL statements executed.',
+    labels=('endpoint',))
+db_rows = Counter(
+    'db_rows_total',
+    'Rows read by executed statements.',
+    labels=('endpoint',))
+
+
+class SqlTally(object):
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+        self.rows = 0
+
+
+_sql = ContextVar('sql_tally', default=None)
+
+
+def start_sql():
+    tally = SqlTally()
+    _sql.set(tally)
+    return tally
+
+
+def record_sql(tally, endpoint):
+    _sql.set(None)
+    queries_per_request.observe(tally.queries, endpoint=endpoint)
+    db_queries.inc(tally.queries, endpoint=endpoint)
+    db_seconds.inc(tally.seconds, endpoint=endpoint)
+    db_rows.inc(tally.rows, endpoint=endpoint)
+
+
+def count_rows(count):
+    tally = _sql.get()
+    if tally is not None:
+        tally.rows += count
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _sql.get() is not None:
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('query_started')
+    tally = _sql.get()
+    if not started or tally is None:
+        return
+    tally.seconds += time.perf_counter() - started.pop()
+    tally.queries += 1
+    consumed = context is not None and context.execution_options.get('count_consumed_rows')
+    if not consumed and cursor.rowcount > 0:
+        tally.rows += cursor.rowcount
+
+
+def init_app(app):
+    app.config.setdefault('SERVER_TIMING', False)
+    app.before_request(_start_request)
+    app.after_request(_finish_response)
+    app.teardown_request(_record_request)
+
+
+def _start_request():
+    g.request_started = time.perf_counter()
+    g.sql = start_sql()
+
+
+def _finish_response(response):
+    g.response_status = response.status_code
+    if current_app.config['SERVER_TIMING'] and 'request_started' in g:
+        # Covers the work done before the body is sent; rows rendered from a
+        # streamed template are only counted in /metrics.
+        response.headers['Server-Timing'] = (
+            'db;dur=%.2f;desc="%d queries", app;dur=%.2f' % (
+                g.sql.seconds * 1000, g.sql.queries,
+                (time.perf_counter() - g.request_started) * 1000))
+    return response
+
+
+def _record_request(exception=None):
+    if 'request_started' not in g:
+        return
+    endpoint = request.endpoint or 'unmatched'
+    status = g.get('response_status', 500 if exception else 200)
+    request_seconds.observe(time.perf_counter() - g.request_started,
+                            endpoint=endpoint, method=request.method, status=status)
+    record_sql(g.sql, endpoint)
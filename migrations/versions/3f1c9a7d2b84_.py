@@ -0,0 +1,38 @@
+"""trigram search indexes on venue and artist
+
+Revision ID: 3f1c9a7d2b84
+Revises: 66cc19b28f0f
+Create Date: 2026-10-18 09:12:40.518233
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c9a7d2b84'
+down_revision = '66cc19b28f0f'
+branch_labels = None
+depends_on = None
+
+TRIGRAM_INDEXES = [
+    ('ix_venue_name_trgm', 'Venue', 'name'),
+    ('ix_venue_city_trgm', 'Venue', 'city'),
+    ('ix_venue_state_trgm', 'Venue', 'state'),
+    ('ix_artist_name_trgm', 'Artist', 'name'),
+    ('ix_artist_city_trgm', 'Artist', 'city'),
+    ('ix_artist_state_trgm', 'Artist', 'state'),
+]
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in TRIGRAM_INDEXES:
+        op.create_index(name, table, [column], unique=False,
+                        postgresql_using='gin',
+                        postgresql_ops={column: 'gin_trgm_ops'})
+
+
+def downgrade():
+    for name, table, column in TRIGRAM_INDEXES:
+        op.drop_index(name, table_name=table)
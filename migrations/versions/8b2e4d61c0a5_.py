@@ -0,0 +1,38 @@
+"""composite indexes for show lookups and the venue directory
+
+Revision ID: 8b2e4d61c0a5
+Revises: 3f1c9a7d2b84
+Create Date: 2026-10-18 10:03:17.204511
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b2e4d61c0a5'
+down_revision = '3f1c9a7d2b84'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_show_venue_id_start_time', 'show', ['venue_id', 'start_time']),
+    ('ix_show_artist_id_start_time', 'show', ['artist_id', 'start_time']),
+    ('ix_venue_state_city', 'Venue', ['state', 'city']),
+]
+
+
+# CREATE INDEX CONCURRENTLY cannot run inside a transaction, so these are
+# issued from an autocommit block and the tables stay writable meanwhile.
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False,
+                            postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.drop_index(name, table_name=table,
+                          postgresql_concurrently=True)
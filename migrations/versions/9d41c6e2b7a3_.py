@@ -0,0 +1,178 @@
+"""partition show by month of start_time
+
+Revision ID: 9d41c6e2b7a3
+Revises: f7b3d2a6e014
+Create Date: 2026-10-18 18:12:09.664020
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d41c6e2b7a3'
+down_revision = 'f7b3d2a6e014'
+branch_labels = None
+depends_on = None
+
+# Months of empty partitions created ahead of today; `flask partitions
+# ensure` keeps the window rolling after this.
+MONTHS_AHEAD = 12
+
+DURING = "tsrange(start_time, start_time + duration_minutes * interval '1 minute', '[)')"
+
+COLUMNS = '''
+    id integer NOT NULL DEFAULT nextval('show_id_seq'),
+    artist_id integer NOT NULL,
+    venue_id integer NOT NULL,
+    start_time timestamp without time zone NOT NULL,
+    duration_minutes integer NOT NULL DEFAULT 120,
+    during tsrange GENERATED ALWAYS AS (%s) STORED
+''' % DURING
+
+# Exclusion constraints cannot be declared on a partitioned table, so each
+# partition gets its own. Shows that cross a month boundary are checked by
+# the application (Show.conflict) rather than by the database.
+CREATE_PARTITION = '''
+CREATE FUNCTION create_show_partition(month date) RETURNS text
+LANGUAGE plpgsql AS $$
+DECLARE
+    month_start date := date_trunc('month', month);
+    partition_name text := 'show_' || to_char(month_start, '"y"YYYY"m"MM');
+BEGIN
+    IF to_regclass(partition_name) IS NULL THEN
+        EXECUTE format('CREATE TABLE %I PARTITION OF show FOR VALUES FROM (%L) TO (%L)',
+                       partition_name, month_start, month_start + interval '1 month');
+        PERFORM add_show_overlap_constraints(partition_name);
+    END IF;
+    RETURN partition_name;
+END $$;
+'''
+
+ADD_CONSTRAINTS = '''
+CREATE FUNCTION add_show_overlap_constraints(partition_name text) RETURNS void
+LANGUAGE plpgsql AS $$
+BEGIN
+    EXECUTE format('ALTER TABLE %I ADD CONSTRAINT %I EXCLUDE USING gist '
+                   '(venue_id WITH =, during WITH &&)',
+                   partition_name, partition_name || '_venue_no_overlap');
+    EXECUTE format('ALTER TABLE %I ADD CONSTRAINT %I EXCLUDE USING gist '
+                   '(artist_id WITH =, during WITH &&)',
+                   partition_name, partition_name || '_artist_no_overlap');
+END $$;
+'''
+
+TRIGGERS = [
+    ('show_counters_insert', 'INSERT', 'NEW TABLE AS new_rows'),
+    ('show_counters_update', 'UPDATE', 'OLD TABLE AS old_rows NEW TABLE AS new_rows'),
+    ('show_counters_delete', 'DELETE', 'OLD TABLE AS old_rows'),
+]
+
+# Counting upcoming shows in a subquery lets the planner skip every
+# partition that ends before now.
+VIEW = '''
+CREATE MATERIALIZED VIEW venue_directory AS
+SELECT v.id,
+       v.name,
+       v.city,
+       v.state,
+       coalesce(u.shows, 0) AS num_upcoming_shows,
+       now() AS refreshed_at
+FROM "Venue" v
+LEFT JOIN (
+    SELECT venue_id, count(*) AS shows FROM show
+    WHERE start_time > LOCALTIMESTAMP
+    GROUP BY venue_id
+) u ON u.venue_id = v.id
+'''
+
+OLD_VIEW = '''
+CREATE MATERIALIZED VIEW venue_directory AS
+SELECT v.id,
+       v.name,
+       v.city,
+       v.state,
+       count(s.id) FILTER (WHERE s.start_time > LOCALTIMESTAMP) AS num_upcoming_shows,
+       now() AS refreshed_at
+FROM "Venue" v
+LEFT JOIN show s ON s.venue_id = v.id
+GROUP BY v.id
+'''
+
+
+def drop_dependents():
+    op.execute('DROP MATERIALIZED VIEW venue_directory')
+    for name, event, referencing in TRIGGERS:
+        op.execute('DROP TRIGGER %s ON show' % name)
+
+
+def create_dependents(view):
+    for name, event, referencing in TRIGGERS:
+        op.execute('CREATE TRIGGER %s AFTER %s ON show REFERENCING %s '
+                   'FOR EACH STATEMENT EXECUTE FUNCTION show_counters_changed()'
+                   % (name, event, referencing))
+    op.execute(view)
+    op.execute('CREATE UNIQUE INDEX ix_venue_directory_id ON venue_directory (id)')
+    op.execute('CREATE INDEX ix_venue_directory_area ON venue_directory (state, city, name, id)')
+
+
+def replace_show(new_table):
+    # Swap in the copy, keeping the id sequence that the old table owns.
+    op.execute('ALTER SEQUENCE show_id_seq OWNED BY NONE')
+    op.execute('DROP TABLE show')
+    op.execute('ALTER TABLE %s RENAME TO show' % new_table)
+    op.execute('ALTER SEQUENCE show_id_seq OWNED BY show.id')
+    op.execute('ALTER TABLE show ADD CONSTRAINT show_artist_id_fkey '
+               'FOREIGN KEY (artist_id) REFERENCES "Artist" (id)')
+    op.execute('ALTER TABLE show ADD CONSTRAINT show_venue_id_fkey '
+               'FOREIGN KEY (venue_id) REFERENCES "Venue" (id)')
+    op.create_index('ix_show_venue_id_start_time', 'show', ['venue_id', 'start_time'])
+    op.create_index('ix_show_artist_id_start_time', 'show', ['artist_id', 'start_time'])
+
+
+def upgrade():
+    connection = op.get_bind()
+    if connection.execute(sa.text('SELECT 1 FROM show WHERE start_time IS NULL LIMIT 1')).first():
+        raise RuntimeError('Shows without a start_time cannot be partitioned; '
+                           'set or delete them before upgrading.')
+
+    drop_dependents()
+    op.execute('CREATE TABLE show_partitioned (%s) PARTITION BY RANGE (start_time)' % COLUMNS)
+    op.execute(ADD_CONSTRAINTS)
+    op.execute(CREATE_PARTITION.replace('PARTITION OF show ', 'PARTITION OF show_partitioned '))
+    # One partition per month from the oldest show to MONTHS_AHEAD from
+    # now, plus a default partition for anything outside that window.
+    op.execute('''
+        SELECT create_show_partition(month::date)
+        FROM generate_series(
+            date_trunc('month', LEAST((SELECT min(start_time) FROM show), LOCALTIMESTAMP)),
+            date_trunc('month', LOCALTIMESTAMP) + interval '%d months',
+            interval '1 month') AS month
+    ''' % MONTHS_AHEAD)
+    op.execute('CREATE TABLE show_default PARTITION OF show_partitioned DEFAULT')
+    op.execute("SELECT add_show_overlap_constraints('show_default')")
+    op.execute('INSERT INTO show_partitioned (id, artist_id, venue_id, start_time, duration_minutes) '
+               'SELECT id, artist_id, venue_id, start_time, duration_minutes FROM show')
+
+    replace_show('show_partitioned')
+    # The partitioning column has to be part of the primary key.
+    op.execute('ALTER TABLE show ADD CONSTRAINT show_pkey PRIMARY KEY (id, start_time)')
+    # Recreated now that the parent is called show again.
+    op.execute('DROP FUNCTION create_show_partition(date)')
+    op.execute(CREATE_PARTITION)
+    create_dependents(VIEW)
+
+
+def downgrade():
+    drop_dependents()
+    op.execute('CREATE TABLE show_plain (%s)' % COLUMNS.replace(
+        'start_time timestamp without time zone NOT NULL', 'start_time timestamp without time zone'))
+    op.execute('INSERT INTO show_plain (id, artist_id, venue_id, start_time, duration_minutes) '
+               'SELECT id, artist_id, venue_id, start_time, duration_minutes FROM show')
+    replace_show('show_plain')
+    op.execute('ALTER TABLE show ADD CONSTRAINT show_pkey PRIMARY KEY (id)')
+    # Named show_venue_no_overlap and show_artist_no_overlap, as before.
+    op.execute("SELECT add_show_overlap_constraints('show')")
+    op.execute('DROP FUNCTION create_show_partition(date)')
+    op.execute('DROP FUNCTION add_show_overlap_constraints(text)')
+    create_dependents(OLD_VIEW)
@@ -0,0 +1,86 @@
+"""create_show_partition moves matching rows out of show_default
+
+Revision ID: a83c5f0e6d17
+Revises: d2a7e4b9c1f3
+Create Date: 2026-10-19 11:02:37.918254
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a83c5f0e6d17'
+down_revision = 'd2a7e4b9c1f3'
+branch_labels = None
+depends_on = None
+
+# A new partition cannot be created while show_default holds rows of its
+# month, which it does once a show is booked past the ensured window. Those
+# rows are moved aside, the partition is created and they are inserted
+# again through `show`, with fyyur.archiving on so the counter triggers
+# leave them counted as they were. updated_at is kept: the shows have not
+# changed.
+CREATE_PARTITION = '''
+CREATE OR REPLACE FUNCTION create_show_partition(month date) RETURNS text
+LANGUAGE plpgsql AS $$
+DECLARE
+    month_start date := date_trunc('month', month);
+    month_end date := month_start + interval '1 month';
+    partition_name text := 'show_' || to_char(month_start, '"y"YYYY"m"MM');
+    archiving text := current_setting('fyyur.archiving', true);
+    moving boolean;
+BEGIN
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN partition_name;
+    END IF;
+    moving := EXISTS (SELECT 1 FROM show_default
+                      WHERE start_time >= month_start AND start_time < month_end);
+    IF moving THEN
+        PERFORM set_config('fyyur.archiving', 'on', true);
+        CREATE TEMP TABLE show_moving ON COMMIT DROP AS
+            SELECT id, artist_id, venue_id, start_time, duration_minutes, updated_at
+            FROM show WITH NO DATA;
+        WITH moved AS (
+            DELETE FROM show_default
+            WHERE start_time >= month_start AND start_time < month_end
+            RETURNING id, artist_id, venue_id, start_time, duration_minutes, updated_at
+        )
+        INSERT INTO show_moving SELECT * FROM moved;
+    END IF;
+    EXECUTE format('CREATE TABLE %I PARTITION OF show FOR VALUES FROM (%L) TO (%L)',
+                   partition_name, month_start, month_end);
+    PERFORM add_show_overlap_constraints(partition_name);
+    IF moving THEN
+        INSERT INTO show (id, artist_id, venue_id, start_time, duration_minutes, updated_at)
+        SELECT id, artist_id, venue_id, start_time, duration_minutes, updated_at
+        FROM show_moving;
+        DROP TABLE show_moving;
+        PERFORM set_config('fyyur.archiving', coalesce(archiving, 'off'), true);
+    END IF;
+    RETURN partition_name;
+END $$;
+'''
+
+OLD_CREATE_PARTITION = '''
+CREATE OR REPLACE FUNCTION create_show_partition(month date) RETURNS text
+LANGUAGE plpgsql AS $$
+DECLARE
+    month_start date := date_trunc('month', month);
+    partition_name text := 'show_' || to_char(month_start, '"y"YYYY"m"MM');
+BEGIN
+    IF to_regclass(partition_name) IS NULL THEN
+        EXECUTE format('CREATE TABLE %I PARTITION OF show FOR VALUES FROM (%L) TO (%L)',
+                       partition_name, month_start, month_start + interval '1 month');
+        PERFORM add_show_overlap_constraints(partition_name);
+    END IF;
+    RETURN partition_name;
+END $$;
+'''
+
+
+def upgrade():
+    op.execute(CREATE_PARTITION)
+
+
+def downgrade():
+    op.execute(OLD_CREATE_PARTITION)
@@ -0,0 +1,93 @@
+"""show_archive for shows older than the archive horizon
+
+Revision ID: b58e2c7d1f40
+Revises: 9d41c6e2b7a3
+Create Date: 2026-10-18 19:03:41.218576
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b58e2c7d1f40'
+down_revision = '9d41c6e2b7a3'
+branch_labels = None
+depends_on = None
+
+# Moving a show into the archive deletes it from `show`; with fyyur.archiving
+# set for the transaction the counter triggers leave it counted as past.
+TRIGGER_FUNCTION = '''
+CREATE OR REPLACE FUNCTION show_counters_changed() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF current_setting('fyyur.archiving', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'INSERT' THEN
+        PERFORM apply_show_counter_changes(ARRAY(
+            SELECT ROW(venue_id, artist_id, start_time, 1)::show_counter_change FROM new_rows));
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM apply_show_counter_changes(ARRAY(
+            SELECT ROW(venue_id, artist_id, start_time, -1)::show_counter_change FROM old_rows));
+    ELSE
+        PERFORM apply_show_counter_changes(ARRAY(
+            SELECT ROW(venue_id, artist_id, start_time, 1)::show_counter_change FROM new_rows
+            UNION ALL
+            SELECT ROW(venue_id, artist_id, start_time, -1)::show_counter_change FROM old_rows));
+    END IF;
+    RETURN NULL;
+END $$;
+'''
+
+OLD_TRIGGER_FUNCTION = '''
+CREATE OR REPLACE FUNCTION show_counters_changed() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM apply_show_counter_changes(ARRAY(
+            SELECT ROW(venue_id, artist_id, start_time, 1)::show_counter_change FROM new_rows));
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM apply_show_counter_changes(ARRAY(
+            SELECT ROW(venue_id, artist_id, start_time, -1)::show_counter_change FROM old_rows));
+    ELSE
+        PERFORM apply_show_counter_changes(ARRAY(
+            SELECT ROW(venue_id, artist_id, start_time, 1)::show_counter_change FROM new_rows
+            UNION ALL
+            SELECT ROW(venue_id, artist_id, start_time, -1)::show_counter_change FROM old_rows));
+    END IF;
+    RETURN NULL;
+END $$;
+'''
+
+
+def upgrade():
+    op.create_table(
+        'show_archive',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('artist_id', sa.Integer(), nullable=False),
+        sa.Column('venue_id', sa.Integer(), nullable=False),
+        sa.Column('start_time', sa.DateTime(), nullable=False),
+        sa.Column('duration_minutes', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['artist_id'], ['Artist.id'], ),
+        sa.ForeignKeyConstraint(['venue_id'], ['Venue.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_show_archive_venue_id_start_time', 'show_archive',
+                    ['venue_id', 'start_time', 'id'])
+    op.create_index('ix_show_archive_artist_id_start_time', 'show_archive',
+                    ['artist_id', 'start_time', 'id'])
+    op.execute(TRIGGER_FUNCTION)
+
+
+def downgrade():
+    # Archived shows go back into `show` (the default partition takes any
+    # month that no longer has its own), already counted as past.
+    op.execute("SET LOCAL fyyur.archiving = 'on'")
+    op.execute('INSERT INTO show (id, artist_id, venue_id, start_time, duration_minutes) '
+               'SELECT id, artist_id, venue_id, start_time, duration_minutes FROM show_archive')
+    op.execute("SET LOCAL fyyur.archiving = 'off'")
+    op.execute(OLD_TRIGGER_FUNCTION)
+    op.drop_index('ix_show_archive_artist_id_start_time', table_name='show_archive')
+    op.drop_index('ix_show_archive_venue_id_start_time', table_name='show_archive')
+    op.drop_table('show_archive')
@@ -0,0 +1,28 @@
+"""keyset pagination index for the venues API
+
+Revision ID: b5d1f7a3c284
+Revises: e0c4b8d2a951
+Create Date: 2026-10-19 12:06:41.583190
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5d1f7a3c284'
+down_revision = 'e0c4b8d2a951'
+branch_labels = None
+depends_on = None
+
+
+# /api/v1/venues pages by (name, id), like /artists; without this every page
+# sorts the whole table. Built CONCURRENTLY, as ix_artist_name_id was.
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index('ix_venue_name_id', 'Venue', ['name', 'id'],
+                        postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_venue_name_id', table_name='Venue', postgresql_concurrently=True)
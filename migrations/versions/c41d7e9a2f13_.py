@@ -0,0 +1,131 @@
+"""denormalized upcoming/past show counters on venue and artist
+
+Revision ID: c41d7e9a2f13
+Revises: 8b2e4d61c0a5
+Create Date: 2026-10-18 13:40:52.771904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41d7e9a2f13'
+down_revision = '8b2e4d61c0a5'
+branch_labels = None
+depends_on = None
+
+# Counters move by deltas computed from each statement's transition tables:
+# concurrent bookings for the same venue cannot overwrite each other's
+# increments, and a bulk INSERT ... SELECT updates each venue once.
+# LOCALTIMESTAMP matches the naive datetime.now() the app compares against.
+APPLY_CHANGES = '''
+CREATE FUNCTION apply_show_counter_changes(changes show_counter_change[]) RETURNS void
+LANGUAGE sql AS $$
+    UPDATE "Venue" t SET
+        upcoming_shows_count = t.upcoming_shows_count + d.upcoming,
+        past_shows_count = t.past_shows_count + d.past,
+        next_show_time = CASE WHEN d.removed THEN (
+            SELECT min(s.start_time) FROM show s
+            WHERE s.venue_id = t.id AND s.start_time > LOCALTIMESTAMP
+        ) ELSE LEAST(t.next_show_time, d.next_show_time) END
+    FROM (
+        SELECT venue_id AS owner_id,
+               sum(CASE WHEN start_time > LOCALTIMESTAMP THEN sign ELSE 0 END) AS upcoming,
+               sum(CASE WHEN start_time <= LOCALTIMESTAMP THEN sign ELSE 0 END) AS past,
+               min(start_time) FILTER (WHERE sign > 0 AND start_time > LOCALTIMESTAMP) AS next_show_time,
+               bool_or(sign < 0) AS removed
+        FROM unnest(changes)
+        GROUP BY venue_id
+    ) d
+    WHERE t.id = d.owner_id;
+
+    UPDATE "Artist" t SET
+        upcoming_shows_count = t.upcoming_shows_count + d.upcoming,
+        past_shows_count = t.past_shows_count + d.past,
+        next_show_time = CASE WHEN d.removed THEN (
+            SELECT min(s.start_time) FROM show s
+            WHERE s.artist_id = t.id AND s.start_time > LOCALTIMESTAMP
+        ) ELSE LEAST(t.next_show_time, d.next_show_time) END
+    FROM (
+        SELECT artist_id AS owner_id,
+               sum(CASE WHEN start_time > LOCALTIMESTAMP THEN sign ELSE 0 END) AS upcoming,
+               sum(CASE WHEN start_time <= LOCALTIMESTAMP THEN sign ELSE 0 END) AS past,
+               min(start_time) FILTER (WHERE sign > 0 AND start_time > LOCALTIMESTAMP) AS next_show_time,
+               bool_or(sign < 0) AS removed
+        FROM unnest(changes)
+        GROUP BY artist_id
+    ) d
+    WHERE t.id = d.owner_id;
+$$;
+'''
+
+TRIGGER_FUNCTION = '''
+CREATE FUNCTION show_counters_changed() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM apply_show_counter_changes(ARRAY(
+            SELECT ROW(venue_id, artist_id, start_time, 1)::show_counter_change FROM new_rows));
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM apply_show_counter_changes(ARRAY(
+            SELECT ROW(venue_id, artist_id, start_time, -1)::show_counter_change FROM old_rows));
+    ELSE
+        PERFORM apply_show_counter_changes(ARRAY(
+            SELECT ROW(venue_id, artist_id, start_time, 1)::show_counter_change FROM new_rows
+            UNION ALL
+            SELECT ROW(venue_id, artist_id, start_time, -1)::show_counter_change FROM old_rows));
+    END IF;
+    RETURN NULL;
+END $$;
+'''
+
+TRIGGERS = [
+    ('show_counters_insert', 'INSERT', 'NEW TABLE AS new_rows'),
+    ('show_counters_update', 'UPDATE', 'OLD TABLE AS old_rows NEW TABLE AS new_rows'),
+    ('show_counters_delete', 'DELETE', 'OLD TABLE AS old_rows'),
+]
+
+RECOUNT = '''
+UPDATE "%(table)s" t SET (upcoming_shows_count, past_shows_count, next_show_time) = (
+    SELECT count(*) FILTER (WHERE s.start_time > LOCALTIMESTAMP),
+           count(*) FILTER (WHERE s.start_time <= LOCALTIMESTAMP),
+           min(s.start_time) FILTER (WHERE s.start_time > LOCALTIMESTAMP)
+    FROM show s WHERE s.%(owner)s = t.id
+)
+'''
+
+
+def upgrade():
+    for table in ('Venue', 'Artist'):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(),
+                                       server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(),
+                                       server_default='0', nullable=False))
+        op.add_column(table, sa.Column('next_show_time', sa.DateTime(), nullable=True))
+        op.create_index('ix_%s_next_show_time' % table.lower(), table, ['next_show_time'])
+
+    op.execute('CREATE TYPE show_counter_change AS '
+               '(venue_id integer, artist_id integer, start_time timestamp, sign integer)')
+    op.execute(APPLY_CHANGES)
+    op.execute(TRIGGER_FUNCTION)
+    for name, event, referencing in TRIGGERS:
+        op.execute('CREATE TRIGGER %s AFTER %s ON show REFERENCING %s '
+                   'FOR EACH STATEMENT EXECUTE FUNCTION show_counters_changed()'
+                   % (name, event, referencing))
+
+    op.execute(RECOUNT % {'table': 'Venue', 'owner': 'venue_id'})
+    op.execute(RECOUNT % {'table': 'Artist', 'owner': 'artist_id'})
+
+
+def downgrade():
+    for name, event, referencing in TRIGGERS:
+        op.execute('DROP TRIGGER %s ON show' % name)
+    op.execute('DROP FUNCTION show_counters_changed()')
+    op.execute('DROP FUNCTION apply_show_counter_changes(show_counter_change[])')
+    op.execute('DROP TYPE show_counter_change')
+    for table in ('Venue', 'Artist'):
+        op.drop_index('ix_%s_next_show_time' % table.lower(), table_name=table)
+        op.drop_column(table, 'next_show_time')
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
@@ -0,0 +1,36 @@
+"""updated_at on venue, artist and show
+
+Revision ID: c6f9a3e1d852
+Revises: b58e2c7d1f40
+Create Date: 2026-10-18 19:47:26.530117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6f9a3e1d852'
+down_revision = 'b58e2c7d1f40'
+branch_labels = None
+depends_on = None
+
+# LOCALTIMESTAMP is stable, so existing rows take the time of the migration
+# without a table rewrite. On `show` the column and index are added to the
+# parent and reach every partition, including ones created later.
+TABLES = (('Venue', 'ix_venue_updated_at'),
+          ('Artist', 'ix_artist_updated_at'),
+          ('show', 'ix_show_updated_at'))
+
+
+def upgrade():
+    for table, index in TABLES:
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=False,
+                                       server_default=sa.text('LOCALTIMESTAMP')))
+        op.create_index(index, table, ['updated_at'])
+
+
+def downgrade():
+    for table, index in TABLES:
+        op.drop_index(index, table_name=table)
+        op.drop_column(table, 'updated_at')
@@ -0,0 +1,41 @@
+"""listing keyset columns are NOT NULL
+
+Revision ID: c9e2a4f6b817
+Revises: b5d1f7a3c284
+Create Date: 2026-10-19 12:31:08.916452
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9e2a4f6b817'
+down_revision = 'b5d1f7a3c284'
+branch_labels = None
+depends_on = None
+
+# /venues pages by (state, city, name, id) and /artists and the API by
+# (name, id). A row comparison with a NULL in it is NULL, so a venue with no
+# city was skipped by every ?after= page past it, and its cursor matched
+# nothing. The forms already require these fields; rows written before that
+# get an empty string, which sorts first.
+COLUMNS = [
+    ('Venue', 'name', sa.String()),
+    ('Venue', 'city', sa.String(length=120)),
+    ('Venue', 'state', sa.String(length=120)),
+    ('Artist', 'name', sa.String()),
+]
+
+
+def upgrade():
+    for table, name, type_ in COLUMNS:
+        op.execute('UPDATE "%s" SET %s = \'\' WHERE %s IS NULL' % (table, name, name))
+        op.alter_column(table, name, existing_type=type_, nullable=False)
+    # The view still holds the NULLs it was last refreshed with.
+    op.execute('REFRESH MATERIALIZED VIEW CONCURRENTLY venue_directory')
+
+
+def downgrade():
+    for table, name, type_ in COLUMNS:
+        op.alter_column(table, name, existing_type=type_, nullable=True)
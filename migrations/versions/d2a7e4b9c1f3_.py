@@ -0,0 +1,34 @@
+"""keyset pagination indexes for the show and artist listings
+
+Revision ID: d2a7e4b9c1f3
+Revises: c6f9a3e1d852
+Create Date: 2026-10-19 09:14:52.307815
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2a7e4b9c1f3'
+down_revision = 'c6f9a3e1d852'
+branch_labels = None
+depends_on = None
+
+
+# /shows pages by (start_time, id) and /artists by (name, id); without these
+# every page sorts the whole table. The Artist index is built CONCURRENTLY.
+# A partitioned table cannot be indexed CONCURRENTLY, so the show index is
+# created on the parent, which builds one per partition and adds it to every
+# partition created later.
+def upgrade():
+    op.create_index('ix_show_start_time_id', 'show', ['start_time', 'id'])
+    with op.get_context().autocommit_block():
+        op.create_index('ix_artist_name_id', 'Artist', ['name', 'id'],
+                        postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_artist_name_id', table_name='Artist', postgresql_concurrently=True)
+    op.drop_index('ix_show_start_time_id', table_name='show')
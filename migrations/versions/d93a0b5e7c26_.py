@@ -0,0 +1,42 @@
+"""materialized view for the city/state venue directory
+
+Revision ID: d93a0b5e7c26
+Revises: c41d7e9a2f13
+Create Date: 2026-10-18 15:02:08.113457
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd93a0b5e7c26'
+down_revision = 'c41d7e9a2f13'
+branch_labels = None
+depends_on = None
+
+# refreshed_at is the same on every row; /venues reads it to report how stale
+# the directory is.
+VIEW = '''
+CREATE MATERIALIZED VIEW venue_directory AS
+SELECT v.id,
+       v.name,
+       v.city,
+       v.state,
+       count(s.id) FILTER (WHERE s.start_time > LOCALTIMESTAMP) AS num_upcoming_shows,
+       now() AS refreshed_at
+FROM "Venue" v
+LEFT JOIN show s ON s.venue_id = v.id
+GROUP BY v.id
+'''
+
+
+def upgrade():
+    op.execute(VIEW)
+    # REFRESH ... CONCURRENTLY needs a unique index on the view.
+    op.execute('CREATE UNIQUE INDEX ix_venue_directory_id ON venue_directory (id)')
+    op.execute('CREATE INDEX ix_venue_directory_area ON venue_directory (state, city, name, id)')
+
+
+def downgrade():
+    op.execute('DROP MATERIALIZED VIEW venue_directory')
@@ -0,0 +1,55 @@
+"""deletions counters for the listing validators
+
+Revision ID: e0c4b8d2a951
+Revises: a83c5f0e6d17
+Create Date: 2026-10-19 11:40:15.274609
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e0c4b8d2a951'
+down_revision = 'a83c5f0e6d17'
+branch_labels = None
+depends_on = None
+
+TABLES = ('Venue', 'Artist', 'show')
+
+# One UPDATE per statement, not per row; a DELETE that matched nothing
+# leaves the counter alone. On `show` the trigger sits on the parent and
+# sees deletes through it, including the archive's.
+FUNCTION = '''
+CREATE FUNCTION count_deletions() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM old_rows) THEN
+        UPDATE deletions SET deletes = deletes + 1 WHERE table_name = TG_TABLE_NAME;
+    END IF;
+    RETURN NULL;
+END $$;
+'''
+
+
+def upgrade():
+    op.create_table(
+        'deletions',
+        sa.Column('table_name', sa.String(), nullable=False),
+        sa.Column('deletes', sa.BigInteger(), server_default='0', nullable=False),
+        sa.PrimaryKeyConstraint('table_name')
+    )
+    op.execute(FUNCTION)
+    for table in TABLES:
+        op.execute("INSERT INTO deletions (table_name) VALUES ('%s')" % table)
+        op.execute('CREATE TRIGGER %s_deletions AFTER DELETE ON "%s" '
+                   'REFERENCING OLD TABLE AS old_rows '
+                   'FOR EACH STATEMENT EXECUTE FUNCTION count_deletions()'
+                   % (table.lower(), table))
+
+
+def downgrade():
+    for table in TABLES:
+        op.execute('DROP TRIGGER %s_deletions ON "%s"' % (table.lower(), table))
+    op.execute('DROP FUNCTION count_deletions()')
+    op.drop_table('deletions')
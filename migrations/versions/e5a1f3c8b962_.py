@@ -0,0 +1,36 @@
+"""GIN indexes on the genres arrays
+
+Revision ID: e5a1f3c8b962
+Revises: d93a0b5e7c26
+Create Date: 2026-10-18 16:21:40.538106
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a1f3c8b962'
+down_revision = 'd93a0b5e7c26'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_venue_genres', 'Venue'),
+    ('ix_artist_genres', 'Artist'),
+]
+
+
+# Serve `genres @> ARRAY[...]` for the ?genre= filters. Built CONCURRENTLY
+# from an autocommit block so the tables stay writable meanwhile.
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, table in INDEXES:
+            op.create_index(name, table, ['genres'], unique=False,
+                            postgresql_using='gin', postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table in INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
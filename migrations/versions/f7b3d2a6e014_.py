@@ -0,0 +1,60 @@
+"""show duration, booking range and double-booking exclusion constraints
+
+Revision ID: f7b3d2a6e014
+Revises: e5a1f3c8b962
+Create Date: 2026-10-18 17:05:52.901337
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7b3d2a6e014'
+down_revision = 'e5a1f3c8b962'
+branch_labels = None
+depends_on = None
+
+DURING = "tsrange(start_time, start_time + duration_minutes * interval '1 minute', '[)')"
+
+# Pairs of existing shows that the constraints would reject.
+OVERLAPS = '''
+SELECT a.id, b.id FROM show a JOIN show b
+  ON a.id < b.id
+ AND (a.venue_id = b.venue_id OR a.artist_id = b.artist_id)
+ AND a.during && b.during
+LIMIT 20
+'''
+
+CONSTRAINTS = [
+    ('show_venue_no_overlap', 'venue_id'),
+    ('show_artist_no_overlap', 'artist_id'),
+]
+
+
+def upgrade():
+    # btree_gist lets the GiST index compare the integer ids with =.
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.add_column('show', sa.Column('duration_minutes', sa.Integer(), nullable=False,
+                                    server_default='120'))
+    op.add_column('show', sa.Column('during', sa.dialects.postgresql.TSRANGE(),
+                                    sa.Computed(DURING, persisted=True)))
+
+    overlaps = op.get_bind().execute(sa.text(OVERLAPS)).fetchall()
+    if overlaps:
+        raise RuntimeError(
+            'Existing shows are double-booked; move or shorten them before upgrading. '
+            'Overlapping show ids: %s' % ', '.join('%d/%d' % tuple(pair) for pair in overlaps))
+
+    # Adding an exclusion constraint builds its index under a lock that
+    # blocks writes to show for the duration.
+    for name, column in CONSTRAINTS:
+        op.execute('ALTER TABLE show ADD CONSTRAINT %s '
+                   'EXCLUDE USING gist (%s WITH =, during WITH &&)' % (name, column))
+
+
+def downgrade():
+    for name, column in CONSTRAINTS:
+        op.drop_constraint(name, 'show')
+    op.drop_column('show', 'during')
+    op.drop_column('show', 'duration_minutes')
@@ -1,27 +1,127 @@
-from datetime import datetime
+from datetime import datetime, timedelta
+from itertools import groupby
 from sqlalchemy import Column, String, Integer, Boolean, DateTime, ARRAY, ForeignKey
 from flask_sqlalchemy import SQLAlchemy
-db = SQLAlchemy()
+from sqlalchemy import and_, event, func, or_, select, union
+from sqlalchemy.orm import contains_eager, load_only
+from sqlalchemy.dialects.postgresql import TSRANGE
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from metrics import InstrumentedQueuePool
+from routing import RoutingSession, replicas
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 
 # TODO: connect to a local postgresql database
 def db_setup(app):
-    db.app = app
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
+    binds = app.config.setdefault('SQLALCHEMY_BINDS', {})
+    for index, url in enumerate(app.config['DATABASE_REPLICA_URLS']):
+        key = 'replica_%d' % index
+        binds.setdefault(key, dict(engine_options(app.config, url, key), url=url))
     db.init_app(app)
+    replicas.init_app(app)
+    if app.config['DB_PGBOUNCER'] and app.config['DB_STATEMENT_TIMEOUT_MS']:
+        with app.app_context():
+            for engine in db.engines.values():
+                event.listen(engine, 'begin', statement_timeout(
+                    app.config['DB_STATEMENT_TIMEOUT_MS']))
     return db
 
+
+def engine_options(config, url=None, logging_name='primary'):
+    # Pool and connection settings from the DB_* config values.
+    options = {
+        'poolclass': InstrumentedQueuePool,
+        'pool_logging_name': logging_name,
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    }
+    connect_args = {}
+    timeout = config['DB_STATEMENT_TIMEOUT_MS']
+    if config['DB_PGBOUNCER']:
+        # pgbouncer in transaction mode hands each transaction to whichever
+        # server connection is free: startup options are rejected and
+        # prepared statements would end up on the wrong backend. The timeout
+        # is set per transaction instead (see statement_timeout()).
+        driver = make_url(url or config['SQLALCHEMY_DATABASE_URI']).get_driver_name()
+        if driver == 'psycopg':
+            connect_args['prepare_threshold'] = None
+        elif driver == 'asyncpg':
+            connect_args['statement_cache_size'] = 0
+            connect_args['prepared_statement_cache_size'] = 0
+    elif timeout:
+        connect_args['options'] = '-c statement_timeout=%d' % timeout
+    if connect_args:
+        options['connect_args'] = connect_args
+    return options
+
+
+def async_engine_options(config, url, logging_name='primary'):
+    # The same settings for an asyncpg engine (see asgi.py). asyncio engines
+    # need an asyncio-aware pool, and asyncpg takes server settings instead
+    # of libpq startup options.
+    options = engine_options(config, url, logging_name)
+    options['poolclass'] = AsyncAdaptedQueuePool
+    connect_args = options.get('connect_args', {})
+    if 'options' in connect_args:
+        del connect_args['options']
+        connect_args['server_settings'] = {
+            'statement_timeout': str(config['DB_STATEMENT_TIMEOUT_MS'])}
+    return options
+
+
+def async_url(url):
+    return make_url(url).set(drivername='postgresql+asyncpg')
+
+
+def statement_timeout(milliseconds):
+    def set_local_timeout(connection):
+        connection.exec_driver_sql('SET LOCAL statement_timeout = %d' % milliseconds)
+    return set_local_timeout
+
 #----------------------------------------------------------------------------#
 # Models.
 #----------------------------------------------------------------------------#
 
 
+def trigram_index(name, column):
+    return db.Index(name, column, postgresql_using='gin',
+                    postgresql_ops={column: 'gin_trgm_ops'})
+
+
+def touch(model, ids):
+    # Moves updated_at forward on rows whose pages show something that was
+    # changed elsewhere, e.g. the artists listed on an edited venue's page.
+    ids = list(ids)
+    if ids:
+        db.session.query(model).filter(model.id.in_(ids)).update(
+            {model.updated_at: datetime.now()}, synchronize_session=False)
+
+
 class Venue(db.Model):
     __tablename__ = 'Venue'
+    __table_args__ = (
+        trigram_index('ix_venue_name_trgm', 'name'),
+        trigram_index('ix_venue_city_trgm', 'city'),
+        trigram_index('ix_venue_state_trgm', 'state'),
+        db.Index('ix_venue_state_city', 'state', 'city'),
+        db.Index('ix_venue_next_show_time', 'next_show_time'),
+        db.Index('ix_venue_genres', 'genres', postgresql_using='gin'),
+        db.Index('ix_venue_updated_at', 'updated_at'),
+        # The /api/v1/venues keyset order.
+        db.Index('ix_venue_name_id', 'name', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    name = db.Column(db.String())
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
+    # The listing keysets compare (state, city, name, id), so none is NULL.
+    name = db.Column(db.String(), nullable=False)
+    city = db.Column(db.String(120), nullable=False)
+    state = db.Column(db.String(120), nullable=False)
     address = db.Column(db.String(120))
     phone = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
@@ -30,16 +130,30 @@ class Venue(db.Model):
     seeking_talent = db.Column(Boolean, default=False)
     website = db.Column(db.String(120))
     genres = db.Column(db.ARRAY(db.String(120)), nullable=False)
+    # Maintained by triggers on `show` and `flask counters roll-forward`;
+    # past_shows_count includes archived shows.
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    next_show_time = db.Column(db.DateTime)
+    # Set by insert(), update() and touch(); the validators behind the
+    # ETag and Last-Modified headers of the pages (see conditional.py).
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now,
+                           server_default=db.text('LOCALTIMESTAMP'))
     venue_shows = db.relationship("Show", backref="venue", lazy=True)
 
     def insert(self):
+        self.updated_at = datetime.now()
         db.session.add(self)
         db.session.commit()
 
     def update(self):
+        # The venue's name and image also appear on its artists' pages.
+        self.updated_at = datetime.now()
+        touch(Artist, Venue.artist_ids(self.id))
         db.session.commit()
 
     def delete(self):
+        touch(Artist, Venue.artist_ids(self.id))
         db.session.delete(self)
         db.session.commit()
 
@@ -65,6 +179,7 @@ class Venue(db.Model):
             'genres': self.genres,
             'address': self.address,
             'city': self.city,
+            'state': self.state,
             'phone': self.phone,
             'website': self.website,
             'facebook_link': self.facebook_link,
@@ -73,14 +188,65 @@ class Venue(db.Model):
             'image_link': self.image_link
         }
 
+    @staticmethod
+    def directory_statement():
+        # The live directory, used when /venues is filtered by genre (the
+        # materialized view has no genres). Upcoming counts come from the
+        # maintained counter, so there is no join or aggregate.
+        return select(
+            Venue.id,
+            Venue.name,
+            Venue.city,
+            Venue.state,
+            Venue.upcoming_shows_count.label('num_upcoming_shows')
+        )
+
+    @staticmethod
+    def directory():
+        return db.session.query(*Venue.directory_statement().selected_columns)
+
+    @staticmethod
+    def artist_ids(venue_id):
+        # Artists whose pages list a show at this venue, archived ones
+        # included.
+        return list(db.session.scalars(union(
+            select(Show.artist_id).filter(Show.venue_id == venue_id),
+            select(ShowArchive.artist_id).filter(ShowArchive.venue_id == venue_id))))
+
+    @staticmethod
+    def areas(rows):
+        # Yields one area at a time so the directory can be streamed. Rows
+        # must be ordered by (state, city), which the directory pagination
+        # does in SQL; only one area's venues are held in memory.
+        for (state, city), venues in groupby(rows, key=lambda row: (row.state, row.city)):
+            yield {
+                'city': city,
+                'state': state,
+                'venues': [{
+                    'id': row.id,
+                    'name': row.name,
+                    'num_upcoming_shows': row.num_upcoming_shows
+                } for row in venues]
+            }
+
     # TODO: implement any missing fields, as a database migration using Flask-Migrate
 
 
 class Artist(db.Model):
     __tablename__ = 'Artist'
+    __table_args__ = (
+        trigram_index('ix_artist_name_trgm', 'name'),
+        trigram_index('ix_artist_city_trgm', 'city'),
+        trigram_index('ix_artist_state_trgm', 'state'),
+        db.Index('ix_artist_next_show_time', 'next_show_time'),
+        db.Index('ix_artist_genres', 'genres', postgresql_using='gin'),
+        db.Index('ix_artist_updated_at', 'updated_at'),
+        # The /artists keyset order.
+        db.Index('ix_artist_name_id', 'name', 'id'),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    name = db.Column(db.String())
+    name = db.Column(db.String(), nullable=False)
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
@@ -90,15 +256,28 @@ class Artist(db.Model):
     seeking_venue = db.Column(db.Boolean, default=False)
     seeking_description = db.Column(db.String(120))
     website = db.Column(db.String(120))
+    # Maintained by triggers on `show` and `flask counters roll-forward`;
+    # past_shows_count includes archived shows.
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    next_show_time = db.Column(db.DateTime)
+    # Set by insert(), update() and touch(); the validators behind the
+    # ETag and Last-Modified headers of the pages (see conditional.py).
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now,
+                           server_default=db.text('LOCALTIMESTAMP'))
     artist_show = db.relationship("Show", backref="artist", lazy=True)
 
     # TODO: implement any missing fields, as a database migration using Flask-Migrate
 
     def insert(self):
+        self.updated_at = datetime.now()
         db.session.add(self)
         db.session.commit()
 
     def update(self):
+        # The artist's name and image also appear on its venues' pages.
+        self.updated_at = datetime.now()
+        touch(Venue, Artist.venue_ids(self.id))
         db.session.commit()
 
     def short(self):
@@ -107,6 +286,14 @@ class Artist(db.Model):
             'name': self.name,
         }
 
+    @staticmethod
+    def venue_ids(artist_id):
+        # Venues whose pages list a show by this artist, archived ones
+        # included.
+        return list(db.session.scalars(union(
+            select(Show.venue_id).filter(Show.artist_id == artist_id),
+            select(ShowArchive.venue_id).filter(ShowArchive.artist_id == artist_id))))
+
     def details(self):
         return {
             'id': self.id,
@@ -126,33 +313,65 @@ class Artist(db.Model):
 # TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
 
 
+DEFAULT_SHOW_MINUTES = 120
+MAX_SHOW_MINUTES = 24 * 60
+
+
 class Show(db.Model):
 
     __tablename__ = 'show'
+    # Range-partitioned by month of start_time (see partitions.py), so a
+    # query bounded on start_time only reads the partitions it needs. Each
+    # partition carries the show_*_no_overlap exclusion constraints that
+    # stop a venue or an artist being booked twice at once; their GiST
+    # indexes also serve overlap and free-slot lookups.
+    __table_args__ = (
+        db.Index('ix_show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_show_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_show_updated_at', 'updated_at'),
+        # The /shows keyset order.
+        db.Index('ix_show_start_time_id', 'start_time', 'id'),
+        {'postgresql_partition_by': 'RANGE (start_time)'},
+    )
     id = db.Column(Integer, primary_key=True, autoincrement=True)
     artist_id = db.Column(db.ForeignKey("Artist.id"), nullable=False)
     venue_id = db.Column(db.ForeignKey("Venue.id"), nullable=False)
-    start_time = db.Column(db.DateTime, default=datetime.now)
+    start_time = db.Column(db.DateTime, primary_key=True, default=datetime.now)
+    duration_minutes = db.Column(db.Integer, nullable=False, default=DEFAULT_SHOW_MINUTES,
+                                 server_default=str(DEFAULT_SHOW_MINUTES))
+    # [start_time, start_time + duration), maintained by Postgres.
+    during = db.Column(TSRANGE, db.Computed(
+        "tsrange(start_time, start_time + duration_minutes * interval '1 minute', '[)')",
+        persisted=True))
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now,
+                           server_default=db.text('LOCALTIMESTAMP'))
 
     def insert(self):
+        # A new show changes both the venue's and the artist's page.
+        self.updated_at = datetime.now()
         db.session.add(self)
+        touch(Venue, [self.venue_id])
+        touch(Artist, [self.artist_id])
         db.session.commit()
 
+    # The serializers below read the `venue`/`artist` backrefs, so callers
+    # should load them up front with joinedload()/contains_eager() to keep
+    # a list of shows at one query.
     def detail(self):
         return {
             'venue_id': self.venue_id,
-            'venue_name': Venue.query.get(self.venue_id).name,
+            'venue_name': self.venue.name,
             'artist_id': self.artist_id,
-            'artist_name': Artist.query.get(self.artist_id).name,
-            'artist_image_link': Artist.query.get(self.artist_id).image_link,
+            'artist_name': self.artist.name,
+            'artist_image_link': self.artist.image_link,
             'start_time': self.start_time
         }
 
     def artists_details(self):
         return {
             'artist_id': self.artist_id,
-            'artist_name': Artist.query.get(self.artist_id).name,
-            'artist_image_link': Artist.query.get(self.artist_id).image_link,
+            'artist_name': self.artist.name,
+            'artist_image_link': self.artist.image_link,
             'start_time': self.start_time
 
         }
@@ -160,8 +379,124 @@ class Show(db.Model):
     def venues_details(self):
         return {
             'venue_id': self.venue_id,
-            'venue_name': Venue.query.get(self.venue_id).name,
-            'venue_image_link': Venue.query.get(self.venue_id).image_link,
+            'venue_name': self.venue.name,
+            'venue_image_link': self.venue.image_link,
             'start_time': self.start_time
 
         }
+
+    @staticmethod
+    def overlapping(start, end):
+        # Shows whose time range overlaps [start, end). The start_time bounds
+        # (no show is longer than MAX_SHOW_MINUTES) let the planner skip
+        # partitions that cannot hold one.
+        return and_(
+            Show.start_time < end,
+            Show.start_time > start - timedelta(minutes=MAX_SHOW_MINUTES),
+            Show.during.op('&&')(func.tsrange(start, end, '[)')))
+
+    @staticmethod
+    def conflict(venue_id, artist_id, start_time, duration_minutes):
+        # The first show that would overlap this booking, if any. The
+        # exclusion constraints only see one partition, so this is also what
+        # catches a clash across a month boundary.
+        end = start_time + timedelta(minutes=duration_minutes)
+        return Show.query.filter(
+            or_(Show.venue_id == venue_id, Show.artist_id == artist_id),
+            Show.overlapping(start_time, end)
+        ).order_by(Show.start_time).first()
+
+    @staticmethod
+    def free_slots(venue_id, start, end, minimum_minutes=DEFAULT_SHOW_MINUTES):
+        # Gaps of at least minimum_minutes between start and end. Bookings
+        # never overlap, so the gaps lie between consecutive bookings, which
+        # come from one index range scan.
+        booked = db.session.query(Show.start_time, func.upper(Show.during)).filter(
+            Show.venue_id == venue_id, Show.overlapping(start, end)
+        ).order_by(Show.start_time)
+        minimum = timedelta(minutes=minimum_minutes)
+        slots = []
+        free_from = start
+        for booking_start, booking_end in booked:
+            if booking_start - free_from >= minimum:
+                slots.append((free_from, booking_start))
+            free_from = max(free_from, booking_end)
+        if end - free_from >= minimum:
+            slots.append((free_from, end))
+        return slots
+
+    @staticmethod
+    def for_venue(venue_id):
+        # Shows on a venue page, with the artist columns they display. Bound
+        # start_time before running it so only the relevant partitions are
+        # read.
+        return select(Show).join(Show.artist).options(
+            load_only(Show.artist_id, Show.start_time),
+            contains_eager(Show.artist).load_only(
+                Artist.id, Artist.name, Artist.image_link)
+        ).filter(Show.venue_id == venue_id)
+
+    @staticmethod
+    def for_artist(artist_id):
+        # Shows on an artist page, with the venue columns they display.
+        return select(Show).join(Show.venue).options(
+            load_only(Show.venue_id, Show.start_time),
+            contains_eager(Show.venue).load_only(
+                Venue.id, Venue.name, Venue.image_link)
+        ).filter(Show.artist_id == artist_id)
+
+    @staticmethod
+    def past(owner, owner_id, current_time):
+        # Past shows of one venue or artist (owner is 'venue_id' or
+        # 'artist_id'): the recent ones still in `show` and the archived ones.
+        return select(Show.id, Show.venue_id, Show.artist_id, Show.start_time).filter(
+            getattr(Show, owner) == owner_id, Show.start_time <= current_time
+        ).union_all(select(
+            ShowArchive.id, ShowArchive.venue_id, ShowArchive.artist_id, ShowArchive.start_time
+        ).filter(getattr(ShowArchive, owner) == owner_id)).subquery('past_show')
+
+    # The past-shows sections, newest first, for a descending Page over the
+    # returned columns. Rows carry the same keys as artists_details() and
+    # venues_details(). `query` is db.session.query, or select() for an
+    # AsyncPage.
+    @staticmethod
+    def past_for_venue(venue_id, current_time, query=None):
+        past = Show.past('venue_id', venue_id, current_time)
+        return (query or db.session.query)(
+            past.c.start_time, past.c.id, past.c.artist_id,
+            Artist.name.label('artist_name'), Artist.image_link.label('artist_image_link')
+        ).select_from(past).join(Artist, Artist.id == past.c.artist_id), (past.c.start_time, past.c.id)
+
+    @staticmethod
+    def past_for_artist(artist_id, current_time, query=None):
+        past = Show.past('artist_id', artist_id, current_time)
+        return (query or db.session.query)(
+            past.c.start_time, past.c.id, past.c.venue_id,
+            Venue.name.label('venue_name'), Venue.image_link.label('venue_image_link')
+        ).select_from(past).join(Venue, Venue.id == past.c.venue_id), (past.c.start_time, past.c.id)
+
+
+class ShowArchive(db.Model):
+    # Shows older than SHOW_ARCHIVE_DAYS, moved out of `show` by
+    # `flask archive run`. Nothing books against them any more, so there is
+    # no range column or exclusion constraint, and the only reads are the
+    # newest-first past-shows sections, which scan these indexes backwards.
+    __tablename__ = 'show_archive'
+    __table_args__ = (
+        db.Index('ix_show_archive_venue_id_start_time', 'venue_id', 'start_time', 'id'),
+        db.Index('ix_show_archive_artist_id_start_time', 'artist_id', 'start_time', 'id'),
+    )
+    id = db.Column(Integer, primary_key=True, autoincrement=False)
+    artist_id = db.Column(db.ForeignKey("Artist.id"), nullable=False)
+    venue_id = db.Column(db.ForeignKey("Venue.id"), nullable=False)
+    start_time = db.Column(db.DateTime, nullable=False)
+    duration_minutes = db.Column(db.Integer, nullable=False)
+
+
+class Deletions(db.Model):
+    # One row per table, bumped by a statement trigger after each DELETE that
+    # removes rows (and by `flask partitions detach`). With the indexed
+    # max(updated_at) it tells a listing has changed without counting it.
+    __tablename__ = 'deletions'
+    table_name = db.Column(db.String(), primary_key=True)
+    deletes = db.Column(db.BigInteger, nullable=False, default=0, server_default='0')
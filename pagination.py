@@ -0,0 +1,163 @@
+import base64
+import json
+from datetime import datetime
+
+from flask import abort, current_app
+from sqlalchemy import tuple_
+
+from metrics import count_rows
+
+#----------------------------------------------------------------------------#
+# Keyset pagination.
+#----------------------------------------------------------------------------#
+# Pages are addressed by the sort key of the row at their edge rather than by
+# an OFFSET, so every page is a single indexed range scan no matter how deep
+# it is. Cursors are opaque, url-safe tokens carried in ?after= / ?before=.
+
+
+def encode_cursor(values):
+    raw = json.dumps([
+        value.isoformat() if isinstance(value, datetime) else value
+        for value in values
+    ])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, columns):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw.decode('utf-8'))
+    except (TypeError, ValueError):
+        abort(400)
+    if not isinstance(values, list) or len(values) != len(columns):
+        abort(400)
+    for index, column in enumerate(columns):
+        if values[index] is not None and _python_type(column) is datetime:
+            try:
+                values[index] = datetime.fromisoformat(values[index])
+            except (TypeError, ValueError):
+                abort(400)
+    return values
+
+
+def _python_type(column):
+    try:
+        return column.type.python_type
+    except (AttributeError, NotImplementedError):
+        return None
+
+
+def seek(query, columns, after, descending=False):
+    # Rows strictly after the cursor, in key order.
+    if after:
+        keys, cursor = tuple_(*columns), tuple_(*decode_cursor(after, columns))
+        query = query.filter(keys < cursor if descending else keys > cursor)
+    if descending:
+        return query.order_by(*[column.desc() for column in columns])
+    return query.order_by(*columns)
+
+
+class Page(object):
+    # Iterating a page streams its rows from a server-side cursor, so a
+    # template can start rendering before the last row has arrived. The
+    # cursors for the neighbouring pages are only known once the rows have
+    # been consumed; templates read them after the loop.
+
+    def __init__(self, query, columns, after=None, before=None, size=None,
+                 descending=False):
+        # With `descending`, pages run from the highest key down.
+        self.columns = columns
+        self.size = size or current_app.config['PAGE_SIZE']
+        self.after = after
+        self.before = before
+        self.next_cursor = None
+        self.prev_cursor = None
+        self._items = None
+        keys = tuple_(*columns)
+
+        if before:
+            cursor = tuple_(*decode_cursor(before, columns))
+            query = query.filter(keys > cursor if descending else keys < cursor)
+            query = seek(query, columns, None, not descending)
+        else:
+            query = seek(query, columns, after, descending)
+
+        # One extra row tells us whether there is anything past this page
+        # without a separate COUNT. The rows are counted for /metrics as they
+        # are read (see metrics.py).
+        self._query = query.limit(self.size + 1).execution_options(count_consumed_rows=True)
+
+    @property
+    def items(self):
+        if self._items is None:
+            self._items = list(self)
+        return self._items
+
+    def __iter__(self):
+        if self._items is not None:
+            return iter(self._items)
+        if self.before:
+            return iter(self._backward())
+        return self._forward()
+
+    def _forward(self):
+        first = last = None
+        count = 0
+        for row in self._query.yield_per(current_app.config['STREAM_BATCH_SIZE']):
+            count += 1
+            count_rows(1)
+            if count > self.size:
+                break
+            if first is None:
+                first = row
+            last = row
+            yield row
+        self._set_cursors(first, last, has_next=count > self.size,
+                          has_prev=self.after is not None)
+
+    def _backward(self):
+        # Walking backwards reads the rows in reverse key order, so the page
+        # is buffered (it is at most PAGE_SIZE rows) and flipped.
+        rows = self._query.all()
+        count_rows(len(rows))
+        more = len(rows) > self.size
+        rows = rows[:self.size]
+        rows.reverse()
+        if rows:
+            self._set_cursors(rows[0], rows[-1], has_next=True, has_prev=more)
+        return rows
+
+    def _set_cursors(self, first, last, has_next, has_prev):
+        if first is None:
+            return
+        self.next_cursor = self.cursor(last) if has_next else None
+        self.prev_cursor = self.cursor(first) if has_prev else None
+
+    def cursor(self, row):
+        return encode_cursor([getattr(row, column.key) for column in self.columns])
+
+
+class AsyncPage(Page):
+    # A Page over a select() for an AsyncSession. A template cannot await
+    # rows, so load() fetches the page (at most PAGE_SIZE rows) up front.
+
+    async def load(self, session):
+        # select(Show) pages hold Show objects, as Page over Show.query does,
+        # rather than one-element rows.
+        result = await session.execute(self._query)
+        description = self._query.column_descriptions
+        if len(description) == 1 and description[0]['expr'] is description[0]['entity']:
+            result = result.scalars()
+        rows = result.all()
+        count_rows(len(rows))
+        more = len(rows) > self.size
+        rows = rows[:self.size]
+        if self.before:
+            rows.reverse()
+            if rows:
+                self._set_cursors(rows[0], rows[-1], has_next=True, has_prev=more)
+        elif rows:
+            self._set_cursors(rows[0], rows[-1], has_next=more,
+                              has_prev=self.after is not None)
+        self._items = rows
+        return self
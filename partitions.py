@@ -0,0 +1,115 @@
+import re
+from datetime import date, datetime
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import text
+
+from cache import cache
+from counters import recount
+from models import db
+
+#----------------------------------------------------------------------------#
+# Show partitions.
+#----------------------------------------------------------------------------#
+# `show` is range-partitioned by month of start_time (show_y2024m05, ...),
+# with show_default catching anything outside the created months. Queries
+# that bound start_time, like the upcoming and past lists, only scan the
+# partitions they can match. Keep a year of empty partitions ahead of time
+# from cron:
+#
+#   0 3 * * * cd /srv/fyyur && flask partitions ensure
+#
+# and take old months out of the table with `flask partitions detach`. A
+# show booked past the ensured months lands in show_default; when its month
+# is created, create_show_partition moves it into the new partition.
+
+partitions_cli = AppGroup('partitions', help='Maintain the monthly show partitions.')
+
+PARTITIONS = '''
+SELECT c.relname AS name,
+       pg_get_expr(c.relpartbound, c.oid) AS bounds,
+       c.reltuples::bigint AS rows,
+       pg_total_relation_size(c.oid) AS bytes
+FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+WHERE i.inhparent = 'show'::regclass
+ORDER BY c.relname
+'''
+
+DEFAULT_ROWS = 'SELECT count(*) FROM show_default'
+
+MONTHLY = re.compile(r'^show_y(\d{4})m(\d{2})$')
+
+
+def month(value):
+    try:
+        return datetime.strptime(value, '%Y-%m').date()
+    except ValueError:
+        raise click.BadParameter('expected YYYY-MM, got %r' % value)
+
+
+def partition_month(name):
+    match = MONTHLY.match(name)
+    if match is None:
+        return None
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+
+def ensure(months_ahead):
+    moved = db.session.execute(text(DEFAULT_ROWS)).scalar()
+    result = db.session.execute(text(
+        "SELECT create_show_partition((date_trunc('month', LOCALTIMESTAMP) "
+        "+ make_interval(months => n))::date) FROM generate_series(0, :months) AS n"
+    ), {'months': months_ahead})
+    names = result.scalars().all()
+    moved -= db.session.execute(text(DEFAULT_ROWS)).scalar()
+    db.session.commit()
+    return names, moved
+
+
+@partitions_cli.command('ensure')
+@click.option('--months-ahead', default=12, show_default=True,
+              help='Create partitions up to this many months from now.')
+def ensure_command(months_ahead):
+    """Create any missing partitions from this month onwards."""
+    names, moved = ensure(months_ahead)
+    click.echo('%d partitions, %s to %s; %d shows moved out of show_default' % (
+        len(names), names[0], names[-1], moved))
+
+
+@partitions_cli.command('list')
+def list_command():
+    """List partitions with their bounds and estimated row counts."""
+    for row in db.session.execute(text(PARTITIONS)):
+        click.echo('%-16s %10d rows %8.1f MB  %s' % (
+            row.name, max(row.rows, 0), row.bytes / 1048576.0, row.bounds))
+
+
+@partitions_cli.command('detach')
+@click.option('--before', required=True, type=month, metavar='YYYY-MM',
+              help='Detach the partitions of months before this one.')
+@click.option('--drop', is_flag=True, help='Drop the detached tables as well.')
+def detach_command(before, drop):
+    """Take old months out of the show table."""
+    if before > date.today().replace(day=1):
+        raise click.BadParameter('cannot detach months that are not over yet',
+                                 param_hint='--before')
+    names = [row.name for row in db.session.execute(text(PARTITIONS))
+             if partition_month(row.name) is not None and partition_month(row.name) < before]
+    # A plain DETACH, in one transaction: CONCURRENTLY is not allowed while
+    # show_default exists, and the lock is only held for the catalog update.
+    for name in names:
+        db.session.execute(text('ALTER TABLE show DETACH PARTITION "%s"' % name))
+        if drop:
+            db.session.execute(text('DROP TABLE "%s"' % name))
+    # Detaching deletes no rows, so neither the deletions nor the counter
+    # triggers saw these shows leave.
+    if names:
+        db.session.execute(text(
+            "UPDATE deletions SET deletes = deletes + 1 WHERE table_name = 'show'"))
+    db.session.commit()
+    if names:
+        recount()
+        cache.clear()
+    click.echo('%s %d partitions before %s' % (
+        'dropped' if drop else 'detached', len(names), before.strftime('%Y-%m')))
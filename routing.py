@@ -0,0 +1,96 @@
+import itertools
+import threading
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+
+#----------------------------------------------------------------------------#
+# Read-replica routing.
+#----------------------------------------------------------------------------#
+# GET/HEAD requests read from one of the replica binds configured through
+# DATABASE_REPLICA_URLS. Everything else (form submissions, DELETE, CLI
+# commands, any flush) goes to the primary. After a successful write the
+# client gets a short-lived cookie that pins its reads to the primary for
+# READ_YOUR_WRITES_SECONDS, so it sees its own edit despite replication lag.
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PIN_COOKIE = 'fyyur_primary'
+
+
+class RoutingSession(Session):
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and reads_from_replica():
+            engine = replicas.engine()
+            if engine is not None:
+                return engine
+        return super(RoutingSession, self).get_bind(
+            mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def reads_from_replica():
+    return has_request_context() and g.get('db_read_only', False)
+
+
+@contextmanager
+def primary_reads():
+    # For filling the page cache: a lagging replica could put the page from
+    # before the write that just invalidated it back for the full timeout.
+    # Misses are rare, so the primary only sees a fill per entry and expiry.
+    if not has_request_context():
+        yield
+        return
+    read_only = g.get('db_read_only', False)
+    g.db_read_only = False
+    try:
+        yield
+    finally:
+        g.db_read_only = read_only
+
+
+class Replicas(object):
+
+    def __init__(self):
+        self.keys = []
+        self.selection = 'round_robin'
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.keys = sorted(key for key in app.config.get('SQLALCHEMY_BINDS', {})
+                           if key.startswith('replica_'))
+        self.selection = app.config['REPLICA_SELECTION']
+        if self.selection not in ('round_robin', 'least_connections'):
+            raise ValueError('Unknown REPLICA_SELECTION %r' % self.selection)
+        app.before_request(route_request)
+        app.after_request(pin_after_write)
+
+    def engine(self):
+        # One replica per request, so every read in it sees the same snapshot
+        # of replication.
+        if not self.keys:
+            return None
+        if 'db_replica' not in g:
+            engines = current_app.extensions['sqlalchemy'].engines
+            if self.selection == 'least_connections':
+                key = min(self.keys, key=lambda key: engines[key].pool.checkedout())
+            else:
+                with self._lock:
+                    key = self.keys[next(self._counter) % len(self.keys)]
+            g.db_replica = engines[key]
+        return g.db_replica
+
+
+replicas = Replicas()
+
+
+def route_request():
+    g.db_read_only = request.method in SAFE_METHODS and PIN_COOKIE not in request.cookies
+
+
+def pin_after_write(response):
+    window = current_app.config['READ_YOUR_WRITES_SECONDS']
+    if request.method not in SAFE_METHODS and response.status_code < 400 and window:
+        response.set_cookie(PIN_COOKIE, '1', max_age=window, httponly=True, samesite='Lax')
+    return response
@@ -0,0 +1,57 @@
+from flask import current_app
+from sqlalchemy import case, cast, func, or_, select
+from sqlalchemy.dialects.postgresql import array
+
+from forms import ArtistForm, VenueForm, genre_choices
+from models import db, Artist, Venue
+
+#----------------------------------------------------------------------------#
+# Search.
+#----------------------------------------------------------------------------#
+# Partial, case-insensitive matching on name, city and state. The ILIKE
+# predicates are served by the pg_trgm GIN indexes declared on the models,
+# so a search no longer scans the whole table. Results are ranked by how well
+# the name matches and capped at SEARCH_RESULT_LIMIT.
+
+
+def venues(term, limit=None):
+    return db.session.execute(venues_statement(
+        term, limit or current_app.config['SEARCH_RESULT_LIMIT'])).all()
+
+
+def artists(term, limit=None):
+    return db.session.execute(artists_statement(
+        term, limit or current_app.config['SEARCH_RESULT_LIMIT'])).all()
+
+
+# The statements are shared with the async read routes in asgi.py.
+def venues_statement(term, limit):
+    return _statement(Venue, genre_choices(VenueForm), term, limit)
+
+
+def artists_statement(term, limit):
+    return _statement(Artist, genre_choices(ArtistForm), term, limit)
+
+
+def _statement(model, genres, term, limit):
+    term = term.strip()
+    pattern = '%' + term + '%'
+
+    matches = [
+        model.name.ilike(pattern),
+        model.city.ilike(pattern),
+        model.state.ilike(pattern),
+    ]
+    # Genres are a closed list, so resolve the term against the form choices
+    # and test the array column for overlap instead of unnesting every row.
+    matched_genres = [genre for genre in genres if term and term.lower() in genre.lower()]
+    if matched_genres:
+        # Cast to the column's varchar[]: there is no varchar[] && text[].
+        matches.append(model.genres.op('&&')(cast(array(matched_genres), model.genres.type)))
+
+    rank = (
+        case((model.name.ilike(pattern), 1.0), else_=0.0)
+        + func.similarity(model.name, term)
+    )
+    return select(model.id, model.name).filter(
+        or_(*matches)).order_by(rank.desc(), model.name, model.id).limit(limit)
@@ -0,0 +1,101 @@
+from flask import Blueprint, current_app, flash, render_template, request, session, stream_template
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import contains_eager, load_only
+
+import conditional
+import directory
+from cache import artist_key, cache, venue_key
+from forms import ShowForm
+from models import db, Artist, Show, Venue
+from pagination import Page
+
+blueprint = Blueprint('show', __name__)
+
+# SQLSTATE raised when a show_*_no_overlap constraint rejects a booking.
+EXCLUSION_VIOLATION = '23P01'
+
+
+def double_booked(conflict):
+    return ('Venue %s or artist %s is already booked from %s to %s (show %s).' % (
+        conflict.venue_id, conflict.artist_id, conflict.during.lower,
+        conflict.during.upper, conflict.id))
+
+#  Shows
+#  ----------------------------------------------------------------
+
+@blueprint.route('/shows')
+def shows():
+    # displays list of shows at /shows
+    tag, modified = conditional.shows(db.session.execute(conditional.shows_statement()).one())
+    if conditional.is_fresh(request, session, tag, modified):
+        return conditional.validate(current_app.response_class(status=304), tag, modified)
+    query = Show.query.join(Show.venue).join(Show.artist).options(
+        load_only(Show.venue_id, Show.artist_id, Show.start_time),
+        contains_eager(Show.venue).load_only(Venue.id, Venue.name),
+        contains_eager(Show.artist).load_only(
+            Artist.id, Artist.name, Artist.image_link)
+    ).filter(Show.start_time.isnot(None))
+    page = Page(
+        query,
+        (Show.start_time, Show.id),
+        after=request.args.get('after'),
+        before=request.args.get('before')
+    )
+    data = map(Show.detail, page)
+    return conditional.validate(current_app.response_class(stream_template(
+        'pages/shows.html', shows=data, page=page)), tag, modified)
+
+
+@blueprint.route('/shows/create')
+def create_shows():
+    # renders form. do not touch.
+    form = ShowForm()
+    return render_template('forms/new_show.html', form=form)
+
+
+@blueprint.route('/shows/create', methods=['POST'])
+def create_show_submission():
+    # called to create new shows in the db, upon submitting new show listing form
+    # TODO: insert form data as a new Show record in the db, instead
+    form = ShowForm(request.form)
+    if form.validate_on_submit():
+        conflict = Show.conflict(form.venue_id.data, form.artist_id.data,
+                                 form.start_time.data, form.duration_minutes.data)
+        if conflict is not None:
+            flash(double_booked(conflict))
+            return render_template('forms/new_show.html', form=form)
+        try:
+            data = Show(
+                venue_id=form.venue_id.data,
+                artist_id=form.artist_id.data,
+                start_time=form.start_time.data,
+                duration_minutes=form.duration_minutes.data
+            )
+            data.insert()
+            cache.delete(venue_key(data.venue_id), artist_key(data.artist_id))
+            directory.request_refresh()
+    # on successful db insert, flash success
+            flash('Show' + request.form['venue_id'] +
+                  'Show was successfully listed!')
+            db.session.close()
+            return render_template('pages/home.html')
+        except IntegrityError as error:
+            # Booked by someone else between the check and the insert.
+            db.session.rollback()
+            db.session.close()
+            if getattr(error.orig, 'pgcode', None) != EXCLUSION_VIOLATION:
+                raise
+            flash('That venue or artist is already booked at that time.')
+            return render_template('forms/new_show.html', form=form)
+        except SQLAlchemyError:
+            db.session.rollback()
+            db.session.close()
+    # TODO: on unsuccessful db insert, flash an error instead.
+    # e.g., flash('An error occurred. Show could not be listed.')
+    # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
+            flash('An error occurred. Show ' +
+                  data.venues_id + ' could not be listed.')
+            return render_template('forms/new_show.html', form=form)
+    else:
+        flash(form.errors)
+        return render_template('forms/new_show.html', form=form)
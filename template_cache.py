@@ -0,0 +1,112 @@
+import os
+import threading
+import time
+
+import click
+from flask import current_app, g
+from flask.cli import AppGroup, with_appcontext
+from jinja2 import FileSystemBytecodeCache, MemcachedBytecodeCache
+
+from metrics import Gauge
+
+#----------------------------------------------------------------------------#
+# Template compilation.
+#----------------------------------------------------------------------------#
+# Jinja compiles a template to Python the first time it is rendered. With
+# TEMPLATE_BYTECODE_CACHE set, the compiled code is kept between processes:
+#
+#   'filesystem' - files under TEMPLATE_CACHE_DIR (the default)
+#   'redis'      - shared through CACHE_REDIS_URL (needs the `redis` package)
+#   'null'       - compile in every process
+#
+# `flask templates precompile` fills the cache at build time, and with
+# TEMPLATE_PRELOAD each worker loads every template before taking requests,
+# so no visitor pays for compilation after a deploy.
+
+templates_cli = AppGroup('templates', help='Compile and cache the Jinja templates.')
+
+timings = {'preload_seconds': 0.0, 'first_request_seconds': 0.0}
+_first_request = threading.Lock()
+
+
+def bytecode_cache(config, is_async=False):
+    # Jinja keys bytecode by template name and source only, but an async
+    # environment (asgi.py) compiles the same template to different code, so
+    # it gets entries of its own.
+    kind = config.get('TEMPLATE_BYTECODE_CACHE', 'filesystem')
+    namespace = 'async_' if is_async else ''
+    if kind == 'filesystem':
+        directory = config['TEMPLATE_CACHE_DIR']
+        os.makedirs(directory, exist_ok=True)
+        return FileSystemBytecodeCache(directory, pattern='__jinja2_%s%%s.cache' % namespace)
+    if kind == 'redis':
+        import redis
+        return MemcachedBytecodeCache(
+            redis.Redis.from_url(config['CACHE_REDIS_URL']),
+            prefix='fyyur:jinja:%s' % namespace)
+    if kind == 'null':
+        return None
+    raise ValueError('Unknown TEMPLATE_BYTECODE_CACHE %r' % kind)
+
+
+def init_app(app):
+    app.config.setdefault('TEMPLATE_BYTECODE_CACHE', 'filesystem')
+    app.config.setdefault('TEMPLATE_CACHE_DIR', os.path.join(app.root_path, '.jinja_cache'))
+    app.config.setdefault('TEMPLATE_PRELOAD', False)
+    app.jinja_env.bytecode_cache = bytecode_cache(app.config)
+    app.before_request(_start_first_request)
+    app.teardown_request(_finish_first_request)
+
+
+def load_all(environment):
+    # Loading compiles (or reads from the bytecode cache) and keeps the
+    # template in the environment's in-memory cache.
+    names = [name for name in environment.list_templates() if name.endswith('.html')]
+    for name in names:
+        environment.get_template(name)
+    return names
+
+
+def preload(app):
+    # Call once the filters are registered: compiling checks they exist.
+    if not app.config['TEMPLATE_PRELOAD']:
+        return
+    started = time.perf_counter()
+    names = load_all(app.jinja_env)
+    timings['preload_seconds'] = time.perf_counter() - started
+    app.logger.info('preloaded %d templates in %.1f ms',
+                    len(names), timings['preload_seconds'] * 1000)
+
+
+def _start_first_request():
+    if not timings['first_request_seconds'] and _first_request.acquire(blocking=False):
+        g.first_request_started = time.perf_counter()
+
+
+def _finish_first_request(exception=None):
+    if 'first_request_started' in g:
+        timings['first_request_seconds'] = time.perf_counter() - g.first_request_started
+        current_app.logger.info('first request served in %.1f ms',
+                                timings['first_request_seconds'] * 1000)
+
+
+@templates_cli.command('precompile')
+@with_appcontext
+def precompile_command():
+    """Compile every template into the bytecode cache."""
+    environment = current_app.jinja_env
+    if environment.bytecode_cache is None:
+        raise click.ClickException('TEMPLATE_BYTECODE_CACHE is null; nothing to fill.')
+    started = time.perf_counter()
+    names = load_all(environment)
+    # The same templates as asgi.py's async environment compiles them.
+    load_all(environment.overlay(enable_async=True, bytecode_cache=bytecode_cache(
+        current_app.config, is_async=True)))
+    click.echo('compiled %d templates in %.1f ms'
+               % (len(names), (time.perf_counter() - started) * 1000), err=True)
+
+
+Gauge('template_preload_seconds', 'Time spent loading every template at startup.',
+      collect=lambda: [({}, timings['preload_seconds'])])
+Gauge('first_request_seconds', "Duration of this worker's first request.",
+      collect=lambda: [({}, timings['first_request_seconds'])])
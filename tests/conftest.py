@@ -0,0 +1,20 @@
+import os
+
+import pytest
+
+# Read by config.py on import. The unit tests never connect to the database
+# (engines connect lazily), start the directory refresher or write template
+# bytecode.
+os.environ.setdefault('DIRECTORY_REFRESH_INTERVAL', '0')
+os.environ.setdefault('TEMPLATE_BYTECODE_CACHE', 'null')
+os.environ.setdefault('CACHE_TYPE', 'lru')
+
+from app import create_app  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        yield app
@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+
+from cache import LRUCache, cache, cache_timeout, invalidate_venue
+from models import Venue
+
+
+def test_lru_evicts_the_least_recently_used_entry():
+    lru = LRUCache(max_entries=2)
+    lru.set('a', 1, 60)
+    lru.set('b', 2, 60)
+    # Reading `a` makes `b` the oldest entry.
+    assert lru.get('a') == 1
+    lru.set('c', 3, 60)
+    assert lru.get('b') is None
+    assert (lru.get('a'), lru.get('c')) == (1, 3)
+
+
+def test_lru_drops_expired_entries():
+    lru = LRUCache(max_entries=2)
+    lru.set('live', 1, 60)
+    lru.set('expired', 2, 0)
+    assert lru.get('expired') is None
+    assert lru.get('live') == 1
+
+
+def test_cache_timeout_stops_at_the_next_show(app):
+    now = datetime(2026, 5, 1, 20, 0)
+    assert cache_timeout([], now) == cache.default_timeout
+    soon = [{'start_time': now + timedelta(seconds=90)}]
+    assert cache_timeout(soon, now) == 90
+    later = [{'start_time': now + timedelta(days=1)}]
+    assert cache_timeout(later, now) == cache.default_timeout
+
+
+def test_invalidate_venue_drops_its_artists_pages(app, monkeypatch):
+    for key in ('venue:3', 'facets:Venue', 'artist:5', 'artist:6', 'venue:4'):
+        cache.set(key, key)
+    invalidate_venue(3, artist_ids=[5])
+    assert [cache.get(key) for key in ('venue:3', 'facets:Venue', 'artist:5')] == [None] * 3
+    assert (cache.get('artist:6'), cache.get('venue:4')) == ('artist:6', 'venue:4')
+
+    # Without artist_ids, the venue's artists are looked up.
+    cache.set('venue:3', 'venue:3')
+    monkeypatch.setattr(Venue, 'artist_ids', staticmethod(lambda venue_id: [6]))
+    invalidate_venue(3)
+    assert (cache.get('venue:3'), cache.get('artist:6')) == (None, None)
+    assert cache.get('venue:4') == 'venue:4'
@@ -0,0 +1,61 @@
+import os
+from datetime import datetime
+
+import pytest
+
+from app import explain_show_lookups
+from models import db
+
+# Needs a PostgreSQL database migrated to head. Everything the test writes is
+# rolled back.
+pytestmark = pytest.mark.skipif(
+    not os.environ.get('DATABASE_URL'),
+    reason='set DATABASE_URL to a migrated PostgreSQL database')
+
+VENUES = ARTISTS = 200
+SLOTS = 240
+
+# A show every three days at every venue, from a year ago to a year ahead, so
+# show_default holds the past and every monthly partition has upcoming shows.
+# Each slot books every venue once and, since 7 and ARTISTS are coprime,
+# every artist once: no two shows overlap.
+SEED = '''
+WITH venues AS (
+    INSERT INTO "Venue" (name, city, state, genres)
+    SELECT 'Explain venue ' || n, 'Testville', 'CA', ARRAY['Jazz']
+    FROM generate_series(0, :venues - 1) AS n
+    RETURNING id
+), artists AS (
+    INSERT INTO "Artist" (name, city, state, genres)
+    SELECT 'Explain artist ' || n, 'Testville', 'CA', ARRAY['Jazz']
+    FROM generate_series(0, :artists - 1) AS n
+    RETURNING id
+), v AS (
+    SELECT id, row_number() OVER (ORDER BY id) - 1 AS n FROM venues
+), a AS (
+    SELECT id, row_number() OVER (ORDER BY id) - 1 AS n FROM artists
+)
+INSERT INTO show (artist_id, venue_id, start_time, duration_minutes)
+SELECT a.id, v.id,
+       date_trunc('hour', LOCALTIMESTAMP) - interval '1 year' + slot * interval '3 days',
+       120
+FROM generate_series(0, :slots - 1) AS slot
+CROSS JOIN v
+JOIN a ON a.n = (v.n * 7 + slot) % :artists
+'''
+
+
+def test_hot_show_lookups_choose_partition_indexes(app):
+    connection = db.session.connection()
+    try:
+        connection.exec_driver_sql("SET LOCAL fyyur.archiving = 'on'")
+        connection.execute(db.text(SEED), {
+            'venues': VENUES, 'artists': ARTISTS, 'slots': SLOTS})
+        connection.exec_driver_sql('ANALYZE "Venue", "Artist", show')
+        # The planner's own choice: sequential scans stay enabled.
+        results = explain_show_lookups(connection, datetime.now())
+    finally:
+        db.session.rollback()
+    assert [name for name, index, plan, used in results] == ['show_venue', 'show_artist']
+    for name, index, plan, used in results:
+        assert used, '%s does not scan *_%s_idx:\n%s' % (name, index, plan)
@@ -0,0 +1,78 @@
+from datetime import datetime
+
+import pytest
+
+import exporter
+import importer
+
+VENUE = {
+    'id': 7,
+    'name': 'The Musical Hop',
+    'city': 'San Francisco',
+    'state': 'CA',
+    'address': '1015 Folsom Street',
+    'phone': '123-123-1234',
+    'image_link': 'https://images.example.com/hop.jpg',
+    'facebook_link': None,
+    'genres': ['Jazz', 'R&B'],
+    'website_link': None,
+    'seeking_talent': True,
+    'seeking_description': 'Looking for local artists',
+    'upcoming_shows_count': 2,
+    'past_shows_count': 5,
+    'next_show_time': datetime(2026, 5, 3, 19, 30),
+    'updated_at': datetime(2026, 4, 1, 8, 15, 2, 512000),
+}
+
+ARTIST = {
+    'id': 4,
+    'name': 'Guns N Petals',
+    'city': 'San Francisco',
+    'state': 'CA',
+    'phone': '326-123-5000',
+    'genres': ['Rock n Roll'],
+    'image_link': None,
+    'facebook_link': 'https://www.facebook.com/GunsNPetals',
+    'website_link': 'https://www.gunsnpetalsband.com',
+    'seeking_venue': False,
+    'seeking_description': None,
+    'upcoming_shows_count': 0,
+    'past_shows_count': 1,
+    'next_show_time': None,
+    'updated_at': datetime(2026, 4, 1, 8, 15, 2),
+}
+
+SHOW = {
+    'id': 12,
+    'artist_id': 4,
+    'venue_id': 7,
+    'start_time': datetime(2026, 5, 3, 19, 30, 0, 123456),
+    'duration_minutes': 90,
+    'updated_at': datetime(2026, 4, 1, 8, 15, 2),
+}
+
+CASES = [
+    (exporter.venues_statement, importer.VENUES, VENUE),
+    (exporter.artists_statement, importer.ARTISTS, ARTIST),
+    (exporter.shows_statement, importer.SHOWS, SHOW),
+]
+
+
+@pytest.mark.parametrize('fmt, writer_class', [
+    ('csv', exporter.CsvWriter),
+    ('ndjson', exporter.NdjsonWriter),
+])
+@pytest.mark.parametrize('statement, spec, source', CASES)
+def test_export_imports_back(app, tmp_path, fmt, writer_class, statement, spec, source):
+    columns = statement().selected_columns
+    assert sorted(column.key for column in columns) == sorted(source)
+    path = str(tmp_path / ('export.' + fmt))
+    writer = writer_class(path, columns, False)
+    writer.write([source])
+    writer.close()
+
+    records = list(importer.read_records(path, fmt))
+    assert len(records) == 1
+    row, errors = importer.validate(spec, records[0][1])
+    assert errors == {}
+    assert row == [source['id']] + [source[field] for field, column in spec.fields]
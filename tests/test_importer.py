@@ -0,0 +1,73 @@
+from datetime import datetime
+
+import importer
+
+# A venue as a CSV row reads it: every value a string.
+RECORD = {
+    'id': '7',
+    'name': 'The Musical Hop',
+    'city': 'San Francisco',
+    'state': 'CA',
+    'address': '1015 Folsom Street',
+    'phone': '123-123-1234',
+    'image_link': '',
+    'facebook_link': '',
+    'genres': 'Jazz; R&B',
+    'website_link': 'https://www.themusicalhop.com',
+    'seeking_talent': 'no',
+    'seeking_description': '',
+}
+
+
+def test_validate_maps_form_fields_to_columns(app):
+    row, errors = importer.validate(importer.VENUES, RECORD)
+    assert errors == {}
+    assert dict(zip(importer.VENUES.columns, row)) == {
+        'id': 7,
+        'name': 'The Musical Hop',
+        'city': 'San Francisco',
+        'state': 'CA',
+        'address': '1015 Folsom Street',
+        'phone': '123-123-1234',
+        'image_link': None,
+        'facebook_link': None,
+        'genres': ['Jazz', 'R&B'],
+        'website': 'https://www.themusicalhop.com',
+        'seeking_talent': False,
+        'description': None,
+    }
+
+
+def test_validate_reports_required_and_invalid_fields(app):
+    record = dict(RECORD, name=' ', state='XX', id='seven')
+    row, errors = importer.validate(importer.VENUES, record)
+    assert sorted(errors) == ['id', 'name', 'state']
+
+
+def test_validate_reads_iso_start_times(app):
+    record = {'artist_id': '4', 'venue_id': '7',
+              'start_time': '2026-05-03T19:30:00.123456', 'duration_minutes': '90'}
+    row, errors = importer.validate(importer.SHOWS, record)
+    assert errors == {}
+    assert row == [None, 4, 7, datetime(2026, 5, 3, 19, 30, 0, 123456), 90]
+
+
+def test_earlier_overlaps_keeps_the_first_of_two_clashing_lines():
+    def show(line, venue_id, artist_id, hour):
+        return {'line': line, 'venue_id': venue_id, 'artist_id': artist_id,
+                'start_time': datetime(2026, 5, 3, hour), 'duration_minutes': 120}
+    staged = [
+        show(1, venue_id=1, artist_id=1, hour=19),
+        show(2, venue_id=1, artist_id=2, hour=20),
+        # Clashes only with line 2, which is rejected, so it is kept.
+        show(3, venue_id=2, artist_id=2, hour=20),
+        show(4, venue_id=3, artist_id=1, hour=18),
+    ]
+    assert importer.earlier_overlaps(staged) == [2, 4]
+
+
+def test_copy_value_writes_null_apart_from_empty_strings():
+    # merge() COPYs with NULL '\N'; '' must stay an empty string.
+    assert importer.copy_value(None) == '\\N'
+    assert importer.copy_value('') == ''
+    assert importer.copy_value(['Jazz', 'R"B']) == '{"Jazz","R\\"B"}'
@@ -0,0 +1,27 @@
+from sqlalchemy import create_engine, text
+
+import metrics
+
+
+def test_sql_tally_counts_consumed_rows_once():
+    engine = create_engine('sqlite://')
+    tally = metrics.start_sql()
+    with engine.connect() as connection:
+        connection.execute(text('CREATE TABLE item (id integer)'))
+        connection.execute(text('INSERT INTO item VALUES (1), (2), (3)'))
+        rows = connection.execution_options(count_consumed_rows=True).execute(
+            text('SELECT id FROM item'))
+        for row in rows:
+            metrics.count_rows(1)
+    assert tally.queries == 3
+    # The insert's rowcount plus the rows read from the select.
+    assert tally.rows == 6
+
+    metrics.record_sql(tally, endpoint='test')
+    # Once recorded, later statements and rows are no longer charged to it.
+    with engine.connect() as connection:
+        connection.execute(text('SELECT 1'))
+    metrics.count_rows(5)
+    assert (tally.queries, tally.rows) == (3, 6)
+    assert ('db_rows_total', {'endpoint': 'test'}, 6) in list(metrics.db_rows.samples())
+
@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+
+from models import db, Show
+
+
+class Bookings(object):
+    # Stands in for the free_slots() query: the (start, end) pairs it would
+    # read, in start_time order.
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def filter(self, *criteria):
+        return self
+
+    def order_by(self, *columns):
+        return self
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+def at(hour, minute=0):
+    return datetime(2026, 5, 1) + timedelta(hours=hour, minutes=minute)
+
+
+def test_free_slots_lie_between_bookings(app, monkeypatch):
+    rows = [
+        # Starts before the window and ends inside it.
+        (at(11), at(13)),
+        # Leaves a 30 minute gap, too short for a show.
+        (at(13, 30), at(16)),
+        (at(19), at(21)),
+    ]
+    monkeypatch.setattr(db.session, 'query', lambda *columns: Bookings(rows))
+    assert Show.free_slots(1, at(12), at(24), minimum_minutes=60) == [
+        (at(16), at(19)),
+        (at(21), at(24)),
+    ]
+
+
+def test_free_slots_without_bookings_is_the_whole_window(app, monkeypatch):
+    monkeypatch.setattr(db.session, 'query', lambda *columns: Bookings([]))
+    assert Show.free_slots(1, at(12), at(24)) == [(at(12), at(24))]
+    assert Show.free_slots(1, at(12), at(12, 30), minimum_minutes=60) == []
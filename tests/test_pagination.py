@@ -0,0 +1,35 @@
+import base64
+import json
+from datetime import datetime
+
+import pytest
+from werkzeug.exceptions import BadRequest
+
+from models import Show, Venue
+from pagination import decode_cursor, encode_cursor
+
+COLUMNS = (Show.start_time, Show.id)
+
+
+def raw_token(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode('utf-8')).decode('ascii')
+
+
+def test_cursor_round_trip():
+    values = [datetime(2026, 5, 3, 19, 30, 0, 123456), 12]
+    assert decode_cursor(encode_cursor(values), COLUMNS) == values
+    columns = (Venue.state, Venue.city, Venue.name, Venue.id)
+    values = ['CA', 'San Francisco', 'The Musical Hop', 7]
+    assert decode_cursor(encode_cursor(values), columns) == values
+
+
+@pytest.mark.parametrize('token', [
+    'not a cursor!',
+    encode_cursor([datetime(2026, 5, 3, 19, 30), 12])[:-4],
+    encode_cursor([datetime(2026, 5, 3, 19, 30)]),
+    encode_cursor(['tomorrow', 12]),
+    raw_token({'start_time': '2026-05-03T19:30:00', 'id': 12}),
+])
+def test_tampered_cursor_is_a_bad_request(token):
+    with pytest.raises(BadRequest):
+        decode_cursor(token, COLUMNS)
@@ -0,0 +1,246 @@
+from datetime import datetime, timedelta
+
+from flask import Blueprint, abort, current_app, flash, jsonify, make_response, redirect, render_template, request, session, stream_template, url_for
+from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.http import http_date
+
+import conditional
+import directory
+import facets
+import search
+from cache import cache, cache_timeout, facet_key, invalidate_venue, venue_key
+from forms import VenueForm, genre_choices
+from models import db, Artist, DEFAULT_SHOW_MINUTES, Show, Venue, touch
+from pagination import Page
+from routing import primary_reads
+
+blueprint = Blueprint('venue', __name__)
+
+#  Venues
+#  ----------------------------------------------------------------
+
+@blueprint.route('/venues')
+def venues():
+    form = VenueForm()
+    choices = genre_choices(VenueForm)
+    genres = facets.requested(request.args, choices)
+    refreshed = None if genres else directory.refreshed_at()
+    tag, modified = conditional.listing(
+        db.session.execute(conditional.listing_statement(Venue)).one(), refreshed)
+    if conditional.is_fresh(request, session, tag, modified):
+        return conditional.validate(current_app.response_class(status=304), tag, modified)
+    if genres:
+        query = Venue.directory().filter(facets.contains(Venue, genres))
+        columns = (Venue.state, Venue.city, Venue.name, Venue.id)
+    else:
+        query = directory.query()
+        c = directory.venue_directory.c
+        columns = (c.state, c.city, c.name, c.id)
+    page = Page(
+        query,
+        columns,
+        after=request.args.get('after'),
+        before=request.args.get('before')
+    )
+    data = Venue.areas(page)
+    response = current_app.response_class(stream_template(
+        'pages/venues.html', areas=data, page=page, form=form,
+        facets=facets.counts(Venue, choices), genres=genres))
+    if refreshed is not None:
+        response.headers['X-Directory-Refreshed-At'] = http_date(refreshed)
+        response.headers['X-Directory-Staleness'] = '%d' % directory.staleness(refreshed)
+    return conditional.validate(response, tag, modified)
+
+
+@blueprint.route('/venues/search', methods=['POST'])
+def search_venues():
+    venue_query = search.venues(request.form['search_term'])
+    venue_list = list(map(Venue.short, venue_query))
+    response = {
+        "count": len(venue_list),
+        "data": venue_list
+    }
+    return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
+
+
+@blueprint.route('/venues/<int:venue_id>')
+def show_venue(venue_id):
+    # shows the venue page with the given venue_id
+    current_time = datetime.now()
+    validators = db.session.execute(conditional.detail_statement(Venue, venue_id)).first()
+    if validators is None:
+        abort(404)
+    tag, modified = conditional.detail(validators, current_time)
+    if conditional.is_fresh(request, session, tag, modified):
+        return conditional.validate(current_app.response_class(status=304), tag, modified)
+    venues_details = cache.get(venue_key(venue_id))
+    if venues_details is None:
+        with primary_reads():
+            venue_query = Venue.query.get_or_404(venue_id)
+            venues_details = Venue.detail(venue_query)
+            # Upcoming shows come from the hot partitions only; past shows are
+            # one page at a time, from `show` and show_archive.
+            new_shows_query = db.session.scalars(Show.for_venue(venue_id).filter(
+                Show.start_time > current_time).order_by(Show.start_time)).all()
+            new_show = list(map(Show.artists_details, new_shows_query))
+            venues_details["upcoming_shows"] = new_show
+            venues_details["upcoming_shows_count"] = len(new_show)
+            venues_details["past_shows_count"] = venue_query.past_shows_count
+            venues_details.update(past_shows(venue_id, current_time))
+        cache.set(venue_key(venue_id), venues_details,
+                  timeout=cache_timeout(new_show, current_time))
+    # Only the first page of past shows is cached.
+    after, before = request.args.get('after'), request.args.get('before')
+    if after or before:
+        venues_details = dict(venues_details, **past_shows(
+            venue_id, current_time, after, before))
+
+    return conditional.validate(make_response(render_template(
+        'pages/show_venue.html', venue=venues_details)), tag, modified)
+
+
+def past_shows(venue_id, current_time, after=None, before=None):
+    query, columns = Show.past_for_venue(venue_id, current_time)
+    page = Page(query, columns, after=after, before=before,
+                size=current_app.config['PAST_SHOWS_PAGE_SIZE'], descending=True)
+    return {
+        "past_shows": [row._asdict() for row in page.items],
+        "past_page": {"prev_cursor": page.prev_cursor, "next_cursor": page.next_cursor},
+    }
+
+
+@blueprint.route('/venues/<int:venue_id>/free-slots')
+def free_slots(venue_id):
+    # Open time at a venue for the booking form, by default over the next
+    # seven days: ?start=YYYY-MM-DD&days=N&minutes=N.
+    Venue.query.get_or_404(venue_id)
+    start = request.args.get('start')
+    try:
+        if start:
+            start = datetime.fromisoformat(start)
+        else:
+            start = datetime.now().replace(minute=0, second=0, microsecond=0)
+        days = int(request.args.get('days', 7))
+        minutes = int(request.args.get('minutes', DEFAULT_SHOW_MINUTES))
+    except ValueError:
+        abort(400)
+    if not 1 <= days <= 31 or minutes < 1:
+        abort(400)
+    end = start + timedelta(days=days)
+    return jsonify({
+        'venue_id': venue_id,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'slots': [{'start': slot_start.isoformat(), 'end': slot_end.isoformat()}
+                  for slot_start, slot_end in Show.free_slots(venue_id, start, end, minutes)],
+    })
+
+#  Create Venue
+#  ----------------------------------------------------------------
+
+
+@blueprint.route('/venues/create', methods=['GET'])
+def create_venue_form():
+    form = VenueForm()
+    return render_template('forms/new_venue.html', form=form)
+
+
+@blueprint.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+    # TODO: insert form data as a new Venue record in the db, instead
+    # TODO: modify data to be the data object returned from db insertion
+    form = VenueForm(request.form)
+    if form.validate_on_submit():
+        data = Venue(
+            name=form.name.data,
+            city=form.city.data,
+            state=form.state.data,
+            address=form.address.data,
+            phone=form.phone.data,
+            image_link=form.image_link.data,
+            facebook_link=form.facebook_link.data,
+            genres=form.genres.data,
+            website=form.website_link.data,
+            seeking_talent=form.seeking_talent.data,
+            description=form.seeking_description.data
+        )
+        data.insert()
+        cache.delete(facet_key(Venue))
+        directory.request_refresh()
+        # on successful db insert, flash success
+        flash('Venue ' + request.form['name'] +
+              ' was successfully listed!')
+        db.session.close()
+        return render_template('pages/home.html')
+    else:
+        flash(form.errors)
+        return render_template('forms/new_venue.html', form=form)
+
+
+@blueprint.route('/venues/<int:venue_id>', methods=['DELETE'])
+def delete_venue(venue_id):
+    try:
+        artist_ids = Venue.artist_ids(venue_id)
+        touch(Artist, artist_ids)
+        Venue.query.filter_by(id=venue_id).delete()
+        db.session.commit()
+        invalidate_venue(venue_id, artist_ids)
+        directory.request_refresh()
+    except SQLAlchemyError:
+        db.session.rollback()
+    finally:
+        db.session.close()
+    # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
+    # clicking that button delete it from the db then redirect the user to the homepage
+    return redirect(url_for('index'))
+
+#  Update
+#  ----------------------------------------------------------------
+
+
+@blueprint.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+    venue = Venue.query.filter_by(id=venue_id).first_or_404()
+    form = VenueForm(obj=venue)
+    # TODO: populate form with values from venue with ID <venue_id>
+    return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+
+@blueprint.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+    # TODO: take values from the form submitted, and update existing
+    # venue record with ID <venue_id> using the new attributes
+    form = VenueForm()
+    venue = Venue.query.filter_by(id=venue_id).first_or_404()
+    if venue:
+        if form.validate_on_submit():
+            try:
+                venue.name = form.name.data
+                venue.city = form.city.data
+                venue.state = form.state.data
+                venue.address = form.address.data
+                venue.phone = form.phone.data
+                venue.image_link = form.image_link.data
+                venue.facebook_link = form.facebook_link.data
+                venue.genres = form.genres.data
+                venue.website_link = form.website_link.data
+                venue.seeking_talent = form.seeking_talent.data
+                venue.description = form.seeking_description.data
+                Venue.update(venue)
+                invalidate_venue(venue_id)
+                directory.request_refresh()
+                flash('Venue ' + venue.name + ' was successfully updated!')
+                db.session.close()
+                return redirect(url_for('.show_venue', venue_id=venue_id))
+            except:
+                db.session.rollback()
+                db.session.close()
+                flash(
+                    'An error occurred. Venue ' +
+                    request.form.get("name") +
+                    ' could not be updated.'
+                )
+                return render_template('forms/edit_venue.html', form=form)
+        else:
+            flash(form.errors)
+            return redirect(url_for('.edit_venue', venue_id=venue_id))